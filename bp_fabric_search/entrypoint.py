@@ -3,13 +3,21 @@ import asyncio
 import sys
 import time
 from argparse import ArgumentParser
+from datetime import datetime, timedelta, timezone
 
 from bp_fabric_search.helpers.apic import (build_query, build_sessions,
-                                           query_clients)
+                                           close_sessions, query_clients_until)
 from bp_fabric_search.helpers.config import SETTINGS
+from bp_fabric_search.helpers.correlate import correlate
+from bp_fabric_search.helpers.hits import order_by_hits, record_hits
 from bp_fabric_search.helpers.logging import configure_logger, logger
+from bp_fabric_search.helpers.nodes import build_search
 from bp_fabric_search.helpers.printer import (print_endpoint_table,
+                                              print_history_table,
                                               print_route_table)
+from bp_fabric_search.helpers.shell import Shell
+from bp_fabric_search.helpers.watch import watch
+from bp_fabric_search.history import HistoryStore, collect_history
 from bp_fabric_search.inventory import Inventory
 
 
@@ -30,6 +38,72 @@ def parse_args(args) -> ArgumentParser:
         help="""Provide logging level, default=info.
         Example: --loglevel info""",
     )
+    # create parent subparser for the 'watch' key.
+    parent_watch_parser = argparse.ArgumentParser(add_help=False)
+    parent_watch_parser.add_argument(
+        "--watch",
+        dest="watch",
+        type=int,
+        metavar="INTERVAL",
+        required=False,
+        help="""Repeat the search every INTERVAL seconds and print only the changes.
+        Example: --watch 30""",
+    )
+    # create parent subparser for the table output keys.
+    parent_output_parser = argparse.ArgumentParser(add_help=False)
+    parent_output_parser.add_argument(
+        "--limit",
+        dest="limit",
+        type=int,
+        required=False,
+        help="Only show the first LIMIT results",
+    )
+    parent_output_parser.add_argument(
+        "--sort",
+        dest="sort",
+        type=str,
+        metavar="COLUMN",
+        required=False,
+        help="Sort the results by a column, for example: --sort Node",
+    )
+    parent_output_parser.add_argument(
+        "--reverse",
+        dest="reverse",
+        action="store_true",
+        required=False,
+        help="Sort the results in descending order",
+    )
+    parent_output_parser.add_argument(
+        "--columns",
+        dest="columns",
+        type=str,
+        required=False,
+        help="Comma separated list of columns to show, for example: --columns Host,MAC,Node",
+    )
+    parent_output_parser.add_argument(
+        "--no-pager",
+        dest="no_pager",
+        action="store_true",
+        required=False,
+        help="Do not pipe the results through a pager",
+    )
+    # create parent subparser for the early termination keys.
+    parent_search_parser = argparse.ArgumentParser(add_help=False)
+    parent_search_parser.add_argument(
+        "--first",
+        dest="first",
+        action="store_true",
+        required=False,
+        help="Stop searching once any host returns a result",
+    )
+    parent_search_parser.add_argument(
+        "--ordered",
+        dest="ordered",
+        action="store_true",
+        required=False,
+        help="""With --first or --limit, query the host that has returned the most
+        results in past searches first and only query the rest if required""",
+    )
     subparsers = parser.add_subparsers(
         dest="subparser_name", required=True, help="sub-command help"
     )
@@ -37,7 +111,12 @@ def parse_args(args) -> ArgumentParser:
     # create the parser for the "mac" command
     parser_mac = subparsers.add_parser(
         "mac",
-        parents=[parent_log_parser],
+        parents=[
+            parent_log_parser,
+            parent_watch_parser,
+            parent_output_parser,
+            parent_search_parser,
+        ],
         help="Search endpoints based on MAC address",
     )
     parser_mac.add_argument(
@@ -61,7 +140,12 @@ def parse_args(args) -> ArgumentParser:
     # create the parser for the "ip" command
     parser_ip = subparsers.add_parser(
         "ip",
-        parents=[parent_log_parser],
+        parents=[
+            parent_log_parser,
+            parent_watch_parser,
+            parent_output_parser,
+            parent_search_parser,
+        ],
         help="Search endpoints based on IP address or network",
     )
     parser_ip.add_argument(
@@ -69,7 +153,7 @@ def parse_args(args) -> ArgumentParser:
         dest="ip_address",
         type=str,
         required=False,
-        help="IP Address for example: 10.96.255.10",
+        help="IPv4 or IPv6 Address for example: 10.96.255.10 or 2001:db8::10",
     )
 
     parser_ip.add_argument(
@@ -77,7 +161,7 @@ def parse_args(args) -> ArgumentParser:
         dest="ip_network",
         type=str,
         required=False,
-        help="Network Address for example: 10.0.0.0/8",
+        help="IPv4 or IPv6 Network Address for example: 10.0.0.0/8 or 2001:db8::/32, other values are matched as text",
     )
 
     parser_ip.add_argument(
@@ -92,7 +176,12 @@ def parse_args(args) -> ArgumentParser:
     # create the parser for the "node" command
     parser_node = subparsers.add_parser(
         "node",
-        parents=[parent_log_parser],
+        parents=[
+            parent_log_parser,
+            parent_watch_parser,
+            parent_output_parser,
+            parent_search_parser,
+        ],
         help="Search endpoints based on Node",
     )
     parser_node.add_argument(
@@ -106,7 +195,12 @@ def parse_args(args) -> ArgumentParser:
     # create the parser for the "route" command
     parser_route = subparsers.add_parser(
         "route",
-        parents=[parent_log_parser],
+        parents=[
+            parent_log_parser,
+            parent_watch_parser,
+            parent_output_parser,
+            parent_search_parser,
+        ],
         help="Search routes based on network",
     )
     parser_route.add_argument(
@@ -114,7 +208,7 @@ def parse_args(args) -> ArgumentParser:
         dest="prefix",
         type=str,
         required=True,
-        help="Prefix ID to query",
+        help="IPv4 or IPv6 Prefix to query, for example: 10.96.0.0/24 or 2001:db8::/32",
     )
 
     parser_route.add_argument(
@@ -133,36 +227,168 @@ def parse_args(args) -> ArgumentParser:
         help="Whether the prefix should be an exact match",
     )
 
-    return parser.parse_args(args)
+    parser_route.add_argument(
+        "--per-node",
+        dest="per_node",
+        action="store_true",
+        required=False,
+        help="""Query the routing table of each switch in parallel instead of a
+        single fabric wide query, --vrf must then be an exact VRF name""",
+    )
+
+    parser_route.add_argument(
+        "--node",
+        dest="node",
+        type=str,
+        required=False,
+        help="With --per-node, comma separated list of node ID's to query",
+    )
+
+    parser_route.add_argument(
+        "--concurrency",
+        dest="concurrency",
+        type=int,
+        required=False,
+        help="With --per-node, how many switches to query at once per APIC, default=8",
+    )
+
+    # create the parser for the "history" command
+    parser_history = subparsers.add_parser(
+        "history",
+        parents=[parent_log_parser],
+        help="Collect or search the local endpoint location history",
+    )
+    history_action = parser_history.add_mutually_exclusive_group(required=True)
+    history_action.add_argument(
+        "--mac-address",
+        "-m",
+        dest="mac_address",
+        type=str,
+        help="Mac Address to look up for example: 00:50:56:85:EF:89",
+    )
+    history_action.add_argument(
+        "--collect",
+        dest="collect",
+        action="store_true",
+        help="Pull every endpoint from the APIC's into the history store",
+    )
+    parser_history.add_argument(
+        "--days",
+        dest="days",
+        type=int,
+        default=7,
+        required=False,
+        help="How many days of history to search, default=7",
+    )
+    parser_history.add_argument(
+        "--interval",
+        dest="interval",
+        type=int,
+        required=False,
+        help="Keep collecting every INTERVAL seconds instead of once",
+    )
+
+    # create the parser for the "correlate" command
+    parser_correlate = subparsers.add_parser(
+        "correlate",
+        parents=[parent_log_parser, parent_output_parser],
+        help="Find endpoints present in more than one fabric and duplicate IP's",
+    )
+    parser_correlate.add_argument(
+        "--scope",
+        dest="scope",
+        default="all",
+        choices=["mac", "ip", "all"],
+        help="Whether to correlate MAC addresses, IP addresses or both, default=all",
+    )
+    parser_correlate.add_argument(
+        "--page-size",
+        dest="page_size",
+        type=int,
+        default=10000,
+        required=False,
+        help="How many endpoints to fetch from each APIC per request, default=10000",
+    )
+
+    # create the parser for the "shell" command
+    subparsers.add_parser(
+        "shell",
+        parents=[parent_log_parser],
+        help="Interactive shell that reuses sessions across searches",
+    )
+
+    parsed_args = parser.parse_args(args)
+    subparser = subparsers.choices[parsed_args.subparser_name]
+    if getattr(parsed_args, "limit", None) is not None and parsed_args.limit < 1:
+        subparser.error("--limit must be at least 1")
+    if getattr(parsed_args, "watch", None) is not None and parsed_args.watch < 1:
+        subparser.error("--watch must be at least 1")
+    if (
+        getattr(parsed_args, "page_size", None) is not None
+        and parsed_args.page_size < 1
+    ):
+        subparser.error("--page-size must be at least 1")
+    if parsed_args.subparser_name == "route" and not parsed_args.per_node:
+        if parsed_args.node or parsed_args.concurrency is not None:
+            parser_route.error("--node and --concurrency require --per-node")
+    if parsed_args.subparser_name == "route" and parsed_args.concurrency is not None:
+        if parsed_args.concurrency < 1:
+            parser_route.error("--concurrency must be at least 1")
+
+    return parsed_args
 
 
 async def start(args: ArgumentParser):
     # record the starting time
     start = time.perf_counter()
     inventory = Inventory()
+    query = build_query(args=args)
+    search = build_search(args=args, query=query)
+
+    # a sorted result needs every row, otherwise stop once enough have arrived
+    if args.first or (args.limit and not args.sort):
+        search = build_search(args=args, query=query, page_size=args.limit)
+
+        waves = [inventory.items]
+        if args.ordered:
+            items = order_by_hits(items=inventory.items)
+            waves = [items[:1], items[1:]]
+
+        def enough(query_resp: list) -> bool:
+            rows = [
+                len(host_resp["resp"]["imdata"])
+                for host_resp in query_resp
+                if host_resp["resp"] is not None
+            ]
+            if args.first:
+                return any(rows)
+            return sum(rows) >= args.limit
 
-    session_tasks = [
-        build_sessions(
-            item=item,
+        query_resp = await query_clients_until(
+            waves=waves,
+            search=search,
             username=SETTINGS["INVENTORY_USERNAME"],
             password=SETTINGS["INVENTORY_PASSWORD"],
+            enough=enough,
         )
-        for item in inventory.items
-    ]
+    else:
+        session_tasks = [
+            build_sessions(
+                item=item,
+                username=SETTINGS["INVENTORY_USERNAME"],
+                password=SETTINGS["INVENTORY_PASSWORD"],
+            )
+            for item in inventory.items
+        ]
 
-    await asyncio.gather(*session_tasks)
+        await asyncio.gather(*session_tasks)
 
-    query = build_query(args=args)
+        query_tasks = [search(item=item) for item in inventory.items]
 
-    query_tasks = [
-        query_clients(
-            item=item,
-            query=query,
-        )
-        for item in inventory.items
-    ]
+        query_resp = await asyncio.gather(*query_tasks)
 
-    query_resp = await asyncio.gather(*query_tasks)
+    await close_sessions(items=inventory.items, username=SETTINGS["INVENTORY_USERNAME"])
+    record_hits(data=query_resp)
     logger.debug("APIC Responses:")
     logger.debug(query_resp)
 
@@ -178,16 +404,63 @@ async def start(args: ArgumentParser):
         print_route_table(data=query_resp, query=args, time_taken=time_taken)
 
 
+def history(args: ArgumentParser) -> None:
+    store = HistoryStore()
+    try:
+        if args.collect:
+            asyncio.run(collect_history(store=store, interval=args.interval))
+        else:
+            since = datetime.now(tz=timezone.utc) - timedelta(days=args.days)
+            try:
+                records = store.query_mac(mac=args.mac_address, since=since)
+            except ValueError as e:
+                logger.error(e)
+                sys.exit(1)
+            print_history_table(records=records, query=args)
+    finally:
+        store.close()
+
+
 def main():
     args = parse_args(sys.argv[1:])
     configure_logger(args.loglevel)
 
+    # history lookups only read the local store
+    if args.subparser_name == "history" and not args.collect:
+        history(args=args)
+        return
+
     if SETTINGS["INVENTORY_USERNAME"] is None or SETTINGS["INVENTORY_PASSWORD"] is None:
         logger.error(
             '"INVENTORY_USERNAME" or "INVENTORY_PASSWORD" is undefined, please ensure the are set as environment variables or within a .env file.'
         )
         sys.exit(1)
 
+    if args.subparser_name == "history":
+        try:
+            history(args=args)
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if args.subparser_name == "correlate":
+        asyncio.run(correlate(args=args))
+        return
+
+    if args.subparser_name == "shell":
+        try:
+            Shell(inventory=Inventory(), parse_args=parse_args).run()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if args.watch:
+        try:
+            asyncio.run(watch(args=args))
+        except KeyboardInterrupt:
+            pass
+        return
+
     asyncio.run(start(args=args))
 
 
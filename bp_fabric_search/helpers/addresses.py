@@ -0,0 +1,195 @@
+import ipaddress
+from array import array
+from typing import Iterable, List, Tuple
+
+# IPv4 addresses are held as IPv4-mapped IPv6 addresses (::ffff:a.b.c.d) so
+# both families share one 128 bit representation split over two 64 bit words.
+# The IP version is kept alongside so a mapped IPv6 address never matches or
+# sorts as IPv4.
+WORD_MASK = (1 << 64) - 1
+V4_MAPPED = 0xFFFF << 32
+V4_PREFIX_OFFSET = 96
+
+
+def parse_address(value: str) -> Tuple[int, int, int, int]:
+    """convert an IPv4 or IPv6 address or prefix to fixed width integers
+
+    Args:
+        value (str): address or prefix for example: 10.96.0.0/24 or 2001:db8::1
+
+    Raises:
+        ValueError: Error raised if the value is not an address or prefix
+
+    Returns:
+        Tuple[int, int, int, int]: the IP version, high word, low word and IPv6
+            prefix length
+    """
+    interface = ipaddress.ip_interface(value.strip())
+    address = int(interface.ip)
+    prefixlen = interface.network.prefixlen
+    if interface.version == 4:
+        address |= V4_MAPPED
+        prefixlen += V4_PREFIX_OFFSET
+    return interface.version, address >> 64, address & WORD_MASK, prefixlen
+
+
+def network_mask(prefixlen: int) -> Tuple[int, int]:
+    """return the high and low words of an IPv6 netmask
+
+    Args:
+        prefixlen (int): the IPv6 prefix length
+
+    Returns:
+        Tuple[int, int]: the high and low mask words
+    """
+    mask = ((1 << 128) - 1) ^ ((1 << (128 - prefixlen)) - 1)
+    return mask >> 64, mask & WORD_MASK
+
+
+def normalise_address(value: str) -> str:
+    """return an address in the compressed lower case form used by the APIC,
+    values that are not addresses are returned unchanged.
+
+    Args:
+        value (str): address for example: 2001:DB8:0:0::10
+
+    Returns:
+        str: the normalised address for example: 2001:db8::10
+    """
+    try:
+        return str(ipaddress.ip_address(value.strip()))
+    except ValueError:
+        return value
+
+
+def is_network(value: str) -> bool:
+    """check whether a value parses as an IPv4 or IPv6 network
+
+    Args:
+        value (str): value for example: 10.96.0.0/16 or 10.96
+
+    Returns:
+        bool: True if the value is a network or a single address
+    """
+    try:
+        ipaddress.ip_network(value.strip(), strict=False)
+    except ValueError:
+        return False
+    return True
+
+
+def network_wildcard(network: str) -> str:
+    """return the leading text shared by every address in a network, used to
+    narrow an APIC wcard filter before the network is matched exactly.
+
+    Args:
+        network (str): network for example: 10.96.0.0/16
+
+    Returns:
+        str: wildcard text for example: 10.96.
+    """
+    network = ipaddress.ip_network(network.strip(), strict=False)
+    if network.version == 4:
+        octets = str(network.network_address).split(".")[: network.prefixlen // 8]
+        return ".".join(octets) + "."
+
+    hextets = network.network_address.exploded.split(":")[: network.prefixlen // 16]
+    # zero hextets may be compressed to :: by the APIC, fall back to any IPv6
+    if not hextets or any(int(hextet, 16) == 0 for hextet in hextets):
+        return ":"
+    return ":".join(f"{int(hextet, 16):x}" for hextet in hextets) + ":"
+
+
+class AddressArray:
+    """Column of IPv4/IPv6 addresses held as fixed width integers.
+
+    Addresses are stored in parallel arrays of 64 bit words so filtering,
+    sorting and prefix comparisons are integer operations on the whole column
+    rather than string parsing per comparison. Values that are not addresses
+    are kept, flagged as invalid, so indexes line up with the source rows.
+    """
+
+    def __init__(self):
+        self.version = array("B")
+        self.hi = array("Q")
+        self.lo = array("Q")
+        self.prefixlen = array("B")
+        self.valid = bytearray()
+
+    @classmethod
+    def from_strings(cls, values: Iterable[str]) -> "AddressArray":
+        """build an array from address strings
+
+        Args:
+            values (Iterable[str]): addresses or prefixes
+
+        Returns:
+            AddressArray: the populated array
+        """
+        addresses = cls()
+        for value in values:
+            addresses.append(value)
+        return addresses
+
+    def __len__(self) -> int:
+        return len(self.valid)
+
+    def append(self, value: str) -> None:
+        """add an address or prefix to the end of the array
+
+        Args:
+            value (str): address or prefix for example: 10.96.0.0/24
+        """
+        try:
+            version, hi, lo, prefixlen = parse_address(value)
+            valid = 1
+        except ValueError:
+            version, hi, lo, prefixlen, valid = 0, 0, 0, 0, 0
+        self.version.append(version)
+        self.hi.append(hi)
+        self.lo.append(lo)
+        self.prefixlen.append(prefixlen)
+        self.valid.append(valid)
+
+    def in_network(self, network: str) -> List[int]:
+        """return the indexes of the addresses inside a network, only addresses
+        of the same IP version as the network can match.
+
+        Args:
+            network (str): network for example: 10.96.0.0/16
+
+        Returns:
+            List[int]: indexes of the matching addresses
+        """
+        net_version, net_hi, net_lo, prefixlen = parse_address(network)
+        mask_hi, mask_lo = network_mask(prefixlen)
+        net_hi &= mask_hi
+        net_lo &= mask_lo
+        # invalid entries have version 0 so never match
+        return [
+            index
+            for index, (version, hi, lo) in enumerate(
+                zip(self.version, self.hi, self.lo)
+            )
+            if version == net_version
+            and hi & mask_hi == net_hi
+            and lo & mask_lo == net_lo
+        ]
+
+    def argsort(self, reverse: bool = False) -> List[int]:
+        """return the indexes that would sort the array numerically, IPv4
+        before IPv6 and invalid values always placed last.
+
+        Args:
+            reverse (bool): whether to sort in descending order
+
+        Returns:
+            List[int]: the sorted indexes
+        """
+        version, hi, lo, prefixlen = self.version, self.hi, self.lo, self.prefixlen
+        indexes = [index for index, valid in enumerate(self.valid) if valid]
+        indexes.sort(
+            key=lambda index: (version[index], hi[index], lo[index], prefixlen[index]),
+            reverse=reverse,
+        )
+        return indexes + [index for index, valid in enumerate(self.valid) if not valid]
@@ -1,15 +1,23 @@
+import asyncio
 import json
 from argparse import ArgumentParser
-from typing import AnyStr
+from array import array
+from typing import AnyStr, AsyncIterator, Awaitable, Callable, List
 
 import urllib3
 from httpx import AsyncClient
 
+from bp_fabric_search.helpers.addresses import (AddressArray, is_network,
+                                                network_wildcard,
+                                                normalise_address)
 from bp_fabric_search.helpers.logging import logger
 from bp_fabric_search.inventory import InventoryItem
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# APIC tokens expire after 600 seconds by default, refresh well before that.
+SESSION_REFRESH_INTERVAL = 300
+
 
 async def build_sessions(item: InventoryItem, username: str, password: str) -> None:
     """connect to and authenticate against an APIC returns a async session.
@@ -27,8 +35,8 @@ async def build_sessions(item: InventoryItem, username: str, password: str) -> N
     logger.info(f"Authenticating against host: {item.name}")
     payload = {"aaaUser": {"attributes": {"name": username, "pwd": password}}}
 
+    client = AsyncClient(base_url=f"{item.host}/api", verify=False)
     try:
-        client = AsyncClient(base_url=f"{item.host}/api", verify=False)
         resp = await client.post("/aaaLogin.json", json=payload)
         logger.debug(f"Requested URL: {resp.request.url}")
         logger.debug(f"Response Code: {resp.status_code}")
@@ -46,12 +54,102 @@ async def build_sessions(item: InventoryItem, username: str, password: str) -> N
         )
         logger.debug(e)
         return
+    finally:
+        # close the client unless login succeeded, this includes cancellation
+        # which is not caught above
+        if not client.cookies.get("APIC-Cookie"):
+            await client.aclose()
 
     logger.debug("adding client object to the inventory")
 
     item.client = client
 
 
+async def refresh_sessions(item: InventoryItem, username: str, password: str) -> None:
+    """refresh the token of an authenticated APIC session, falling back to a new login.
+
+    Args:
+        item (InventoryItem): Generated inventory item for host loaded from inventory.yml file.
+        username (str): username for authentication
+        password (str): password for authentication
+    """
+    if item.client is None:
+        await build_sessions(item=item, username=username, password=password)
+        return
+
+    logger.debug(f"Refreshing session for host: {item.name}")
+    try:
+        resp = await item.client.get("/aaaRefresh.json")
+        logger.debug(f"Requested URL: {resp.request.url}")
+        logger.debug(f"Response Code: {resp.status_code}")
+        if resp.is_success:
+            token = resp.json()["imdata"][0]["aaaLogin"]["attributes"]["token"]
+            cookie = dict(name="APIC-Cookie", value=token)
+            item.client.cookies.set(**cookie)
+            return
+        else:
+            # an expired token is expected after a long pause, not an error
+            logger.debug(resp.json())
+            raise ValueError()
+    except Exception as e:
+        logger.info(
+            f"Unable to refresh session to host: {item.name}, logging in again."
+        )
+        logger.debug(e)
+
+    await item.client.aclose()
+    item.client = None
+    await build_sessions(item=item, username=username, password=password)
+
+
+async def keep_sessions_alive(
+    items: List[InventoryItem],
+    username: str,
+    password: str,
+    interval: int = SESSION_REFRESH_INTERVAL,
+) -> None:
+    """refresh every session in the inventory on an interval, runs until cancelled.
+
+    Args:
+        items (List[InventoryItem]): inventory items holding the sessions to refresh
+        username (str): username for authentication
+        password (str): password for authentication
+        interval (int): seconds to wait between refreshes
+    """
+    while True:
+        await asyncio.sleep(interval)
+        await asyncio.gather(
+            *[
+                refresh_sessions(item=item, username=username, password=password)
+                for item in items
+            ]
+        )
+
+
+async def close_sessions(items: List[InventoryItem], username: str) -> None:
+    """log out of and close any open APIC sessions held by the inventory.
+
+    Args:
+        items (List[InventoryItem]): inventory items holding the sessions to close
+        username (str): username the sessions were authenticated with
+    """
+    payload = {"aaaUser": {"attributes": {"name": username}}}
+
+    async def close_session(item: InventoryItem) -> None:
+        client, item.client = item.client, None
+        try:
+            await client.post("/aaaLogout.json", json=payload)
+        except Exception as e:
+            logger.debug(f"Unable to log out of host: {item.name}")
+            logger.debug(e)
+        finally:
+            await client.aclose()
+
+    await asyncio.gather(
+        *[close_session(item) for item in items if item.client is not None]
+    )
+
+
 async def query_clients(item: InventoryItem, query: AnyStr) -> dict:
     """run a query against the APIC
 
@@ -85,6 +183,184 @@ async def query_clients(item: InventoryItem, query: AnyStr) -> dict:
         return dict(host=item.name, resp=None)
 
 
+async def connect_and_query(
+    item: InventoryItem,
+    search: Callable[..., Awaitable[dict]],
+    username: str,
+    password: str,
+) -> dict:
+    """authenticate against an APIC if required and run a search against it
+
+    Args:
+        item (InventoryItem): Generated inventory item for host loaded from inventory.yml file.
+        search (Callable[..., Awaitable[dict]]): called with the item to run the
+            search, for example query_clients with the query already bound
+        username (str): username for authentication
+        password (str): password for authentication
+
+    Returns:
+        dict: the JSON response object from the APIC
+    """
+    if item.client is None:
+        await build_sessions(item=item, username=username, password=password)
+    return await search(item=item)
+
+
+async def query_clients_until(
+    waves: List[List[InventoryItem]],
+    search: Callable[..., Awaitable[dict]],
+    username: str,
+    password: str,
+    enough: Callable[[list], bool],
+) -> list:
+    """query APIC's until enough results have arrived, cancelling any queries
+    that are still outstanding. Each wave of hosts is only queried if the
+    previous waves did not return enough results.
+
+    Args:
+        waves (List[List[InventoryItem]]): groups of inventory items to query in order
+        search (Callable[..., Awaitable[dict]]): called with each item to run the search
+        username (str): username for authentication
+        password (str): password for authentication
+        enough (Callable[[list], bool]): called with the responses so far, returns
+            True once no more responses are needed
+
+    Returns:
+        list: the responses received before enough results had arrived
+    """
+    query_resp = []
+    for wave in waves:
+        query_tasks = [
+            asyncio.create_task(
+                connect_and_query(
+                    item=item, search=search, username=username, password=password
+                )
+            )
+            for item in wave
+        ]
+        try:
+            for query_task in asyncio.as_completed(query_tasks):
+                query_resp.append(await query_task)
+                if enough(query_resp):
+                    return query_resp
+        finally:
+            pending = [task for task in query_tasks if not task.done()]
+            if pending:
+                logger.info(f"Cancelling {len(pending)} outstanding queries.")
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    return query_resp
+
+
+async def query_network(item: InventoryItem, query: AnyStr, network: str) -> dict:
+    """run an endpoint query against the APIC and only keep the endpoints with
+    an IP inside a network
+
+    Args:
+        item (InventoryItem): Generated inventory item for host loaded from inventory.yml file.
+        query (AnyStr): the query parameters to run against the APIC
+        network (str): IPv4 or IPv6 network for example: 10.96.0.0/16
+
+    Returns:
+        dict: the JSON response object from the APIC
+    """
+    host_resp = await query_clients(item=item, query=query)
+    if host_resp["resp"] is None:
+        return host_resp
+
+    imdata = host_resp["resp"]["imdata"]
+    addresses = AddressArray()
+    owners = array("L")
+    for index, entry in enumerate(imdata):
+        for child in entry["fvCEp"].get("children", []):
+            if "fvIp" in child:
+                addresses.append(child["fvIp"]["attributes"]["addr"])
+                owners.append(index)
+
+    matched = sorted({owners[index] for index in addresses.in_network(network)})
+    host_resp["resp"]["imdata"] = [imdata[index] for index in matched]
+    return host_resp
+
+
+def add_paging(query: str, page_size: int, page: int = 0) -> str:
+    """limit a query to a single page of results
+
+    Args:
+        query (str): query string to run against APIC
+        page_size (int): the number of objects per page
+        page (int): the page to return, starting from 0
+
+    Returns:
+        str: the paged query string
+    """
+    return f"{query}&page={page}&page-size={page_size}"
+
+
+async def query_clients_paged(
+    item: InventoryItem, query: str, page_size: int
+) -> AsyncIterator[dict]:
+    """run a query against the APIC one page at a time, the query should be
+    ordered (order-by) so pages are stable.
+
+    Args:
+        item (InventoryItem): Generated inventory item for host loaded from inventory.yml file.
+        query (str): the query parameters to run against the APIC
+        page_size (int): the number of objects per page
+
+    Yields:
+        dict: the JSON response object from the APIC for each page, iteration
+            stops after the first page that fails
+    """
+    page = 0
+    while True:
+        host_resp = await query_clients(
+            item=item, query=add_paging(query=query, page_size=page_size, page=page)
+        )
+        yield host_resp
+        if host_resp["resp"] is None:
+            return
+
+        page += 1
+        total = int(host_resp["resp"].get("totalCount", 0))
+        if not host_resp["resp"]["imdata"] or page * page_size >= total:
+            return
+
+
+def route_family(prefix: str) -> str:
+    """return the routing table class prefix for an IPv4 or IPv6 prefix
+
+    Args:
+        prefix (str): the prefix being searched for
+
+    Returns:
+        str: uribv6 for IPv6 prefixes otherwise uribv4
+    """
+    return "uribv6" if ":" in prefix else "uribv4"
+
+
+def build_route_filter(args: ArgumentParser) -> str:
+    """Generate the uribv4Route or uribv6Route prefix filter for a route search
+
+    Args:
+        args (ArgumentParser): the arguements passed when running the script
+
+    Returns:
+        str: the query-target-filter parameter
+    """
+    # handle 0.0.0.0/0 and ::/0 prefix
+    q_match = "wcard"
+    if args.prefix in ["0.0.0.0/0", "::/0"]:
+        q_match = "eq"
+    # handle exact matches
+    if args.exact:
+        q_match = "eq"
+
+    family = route_family(prefix=args.prefix)
+    return f'query-target-filter=and({q_match}({family}Route.prefix,"{args.prefix}"))'
+
+
 def build_query(args: ArgumentParser) -> str:
     """Generate an APIC query to be used
 
@@ -114,11 +390,18 @@ def build_query(args: ArgumentParser) -> str:
                 return f"/node/class/fvCEp.json?{query}&rsp-subtree=full&rsp-subtree-class=fvIp,fvRsToVm,fvRsVm,fvRsHyper,tagTagDef,fvRsCEpToPathEp,fvPrimaryEncap,fvRsToEpMacTag&rsp-subtree-include=required"
 
             else:
-                query = f'rsp-subtree-filter=eq(fvIp.addr,"{args.ip_address}")'
+                address = normalise_address(value=args.ip_address)
+                query = f'rsp-subtree-filter=eq(fvIp.addr,"{address}")'
                 return f"/node/class/fvCEp.json?{query}&rsp-subtree=full&rsp-subtree-class=fvIp,fvRsToVm,fvRsVm,fvRsHyper,tagTagDef,fvRsCEpToPathEp,fvPrimaryEncap,fvRsToEpMacTag&rsp-subtree-include=required"
 
         elif args.ip_network:
-            query = f'rsp-subtree-filter=and(wcard(fvIp.addr,"{args.ip_network}"))'
+            if is_network(value=args.ip_network):
+                # narrow the search on the APIC, the network is matched exactly by query_network
+                wildcard = network_wildcard(network=args.ip_network)
+            else:
+                # not a network, for example 10.96, keep the plain text match
+                wildcard = args.ip_network
+            query = f'rsp-subtree-filter=and(wcard(fvIp.addr,"{wildcard}"))'
             return f"/node/class/fvCEp.json?{query}&rsp-subtree=full&rsp-subtree-class=fvIp,fvRsToVm,fvRsVm,fvRsHyper,tagTagDef,fvRsCEpToPathEp,fvPrimaryEncap,fvRsToEpMacTag&rsp-subtree-include=required"
 
     # Handle Node search
@@ -129,17 +412,9 @@ def build_query(args: ArgumentParser) -> str:
 
     # Handle Route search
     if args.subparser_name == "route":
-        # handle 0.0.0.0/0 prefix
-        q_match = "wcard"
-        if args.prefix == "0.0.0.0/0":
-            q_match = "eq"
-        # handle exact matches
-        if args.exact:
-            q_match = "eq"
-
         logger.info("Building route search query")
+        family = route_family(prefix=args.prefix)
+        query = build_route_filter(args=args)
         if args.vrf:
-            query = f'query-target-filter=and({q_match}(uribv4Route.prefix,"{args.prefix}"))&rsp-subtree-filter=and(wcard(uribv4Nexthop.vrf,"{args.vrf}"))'
-        else:
-            query = f'query-target-filter=and({q_match}(uribv4Route.prefix,"{args.prefix}"))'
-        return f"/node/class/uribv4Route.json?{query}&rsp-subtree=children&rsp-subtree-class=uribv4Nexthop&rsp-subtree-include=required"
+            query = f'{query}&rsp-subtree-filter=and(wcard({family}Nexthop.vrf,"{args.vrf}"))'
+        return f"/node/class/{family}Route.json?{query}&rsp-subtree=children&rsp-subtree-class={family}Nexthop&rsp-subtree-include=required"
@@ -6,5 +6,8 @@ SETTINGS = {
     "INVENTORY_USERNAME": os.environ.get("INVENTORY_USERNAME"),
     "INVENTORY_PASSWORD": os.environ.get("INVENTORY_PASSWORD"),
     "INVENTORY_PATH": os.environ.get("INVENTORY_PATH", "inventory.yml"),
+    "HISTORY_PATH": os.environ.get("HISTORY_PATH", "history.db"),
+    "HITS_PATH": os.environ.get("HITS_PATH", ".fabric-search-hits.json"),
+    "NODE_CACHE_PATH": os.environ.get("NODE_CACHE_PATH", ".fabric-search-nodes.json"),
     **dotenv_values(".env"),
 }
@@ -0,0 +1,233 @@
+import asyncio
+import ipaddress
+import time
+from argparse import ArgumentParser
+from typing import Iterator
+
+from bp_fabric_search.helpers.apic import (build_sessions, close_sessions,
+                                           query_clients_paged)
+from bp_fabric_search.helpers.config import SETTINGS
+from bp_fabric_search.helpers.logging import logger
+from bp_fabric_search.helpers.macs import int_to_mac, mac_to_int
+from bp_fabric_search.helpers.printer import print_results
+from bp_fabric_search.inventory import Inventory
+
+CORRELATE_QUERY = "/node/class/fvCEp.json?rsp-subtree=children&rsp-subtree-class=fvIp&order-by=fvCEp.dn"
+
+CORRELATE_FIELDS = [
+    "Type",
+    "Address",
+    "VRF",
+    "Hosts",
+    "MAC",
+]
+
+
+def format_vrf(vrf_dn: str) -> str:
+    """convert a VRF DN to the tenant:vrf notation used by the APIC
+
+    Args:
+        vrf_dn (str): VRF DN for example: uni/tn-common/ctx-SITE-2-TRANSIT
+
+    Returns:
+        str: the VRF for example: common:SITE-2-TRANSIT
+    """
+    parts = vrf_dn.split("/")
+    if len(parts) < 3:
+        return vrf_dn
+    return f"{parts[1][3:]}:{parts[2][4:]}"
+
+
+class EndpointIndex:
+    """Hash indexes of endpoints by MAC and by VRF/IP across every fabric.
+
+    Hosts are stored as a bitmask per key so memory grows with the number of
+    distinct MACs and IPs rather than the number of endpoints seen. Only IPs
+    learnt with more than one MAC keep a per MAC breakdown.
+    """
+
+    def __init__(self):
+        self.hosts = []
+        self.vrfs = []
+        self.vrf_ids = {}
+        # mac -> host bitmask
+        self.macs = {}
+        # (vrf id, packed ip) -> (mac, host bitmask)
+        self.ips = {}
+        # (vrf id, packed ip) -> {mac: host bitmask}
+        self.ip_conflicts = {}
+
+    def host_bit(self, host: str) -> int:
+        """return the bitmask for a host, adding it if required
+
+        Args:
+            host (str): the host name
+
+        Returns:
+            int: the single bit identifying the host
+        """
+        if host not in self.hosts:
+            self.hosts.append(host)
+        return 1 << self.hosts.index(host)
+
+    def vrf_id(self, vrf_dn: str) -> int:
+        """return the id for a VRF DN, adding it if required
+
+        Args:
+            vrf_dn (str): the VRF DN
+
+        Returns:
+            int: the VRF id
+        """
+        if vrf_dn not in self.vrf_ids:
+            self.vrf_ids[vrf_dn] = len(self.vrfs)
+            self.vrfs.append(vrf_dn)
+        return self.vrf_ids[vrf_dn]
+
+    def host_names(self, mask: int) -> str:
+        """return the host names in a bitmask
+
+        Args:
+            mask (int): the host bitmask
+
+        Returns:
+            str: newline separated host names
+        """
+        return "\n".join(host for i, host in enumerate(self.hosts) if mask & (1 << i))
+
+    def add(self, host: str, imdata: list) -> None:
+        """add a page of fvCEp entries to the indexes
+
+        Args:
+            host (str): the host the entries were returned by
+            imdata (list): fvCEp entries from an APIC response
+        """
+        bit = self.host_bit(host)
+        for entry in imdata:
+            attributes = entry["fvCEp"]["attributes"]
+            try:
+                mac = mac_to_int(attributes["mac"])
+            except ValueError as e:
+                logger.debug(e)
+                continue
+            self.macs[mac] = self.macs.get(mac, 0) | bit
+
+            for child in entry["fvCEp"].get("children", []):
+                if "fvIp" not in child:
+                    continue
+                ip_attributes = child["fvIp"]["attributes"]
+                try:
+                    ip = ipaddress.ip_address(ip_attributes["addr"]).packed
+                except ValueError as e:
+                    logger.debug(e)
+                    continue
+                vrf_dn = ip_attributes.get("vrfDn") or attributes.get("vrfDn", "")
+                key = (self.vrf_id(vrf_dn), ip)
+
+                if key in self.ip_conflicts:
+                    conflict = self.ip_conflicts[key]
+                    conflict[mac] = conflict.get(mac, 0) | bit
+                    continue
+
+                first_mac, mask = self.ips.get(key, (mac, 0))
+                if first_mac == mac:
+                    self.ips[key] = (mac, mask | bit)
+                else:
+                    del self.ips[key]
+                    self.ip_conflicts[key] = {first_mac: mask, mac: bit}
+
+    def iter_rows(self, scope: str = "all") -> Iterator[tuple]:
+        """report keys that are present in more than one fabric or conflict
+
+        Args:
+            scope (str): mac, ip or all
+
+        Yields:
+            tuple: a table row per finding
+        """
+        if scope in ["mac", "all"]:
+            for mac, mask in self.macs.items():
+                # more than one bit set means more than one host
+                if mask & (mask - 1):
+                    yield (
+                        "Multi-fabric MAC",
+                        int_to_mac(mac),
+                        "",
+                        self.host_names(mask),
+                        "",
+                    )
+
+        if scope in ["ip", "all"]:
+            for (vrf, ip), macs in self.ip_conflicts.items():
+                mask = 0
+                for host_mask in macs.values():
+                    mask |= host_mask
+                yield (
+                    "Duplicate IP",
+                    str(ipaddress.ip_address(ip)),
+                    format_vrf(self.vrfs[vrf]),
+                    self.host_names(mask),
+                    "\n".join(int_to_mac(mac) for mac in macs),
+                )
+
+            for (vrf, ip), (mac, mask) in self.ips.items():
+                if mask & (mask - 1):
+                    yield (
+                        "Multi-fabric IP",
+                        str(ipaddress.ip_address(ip)),
+                        format_vrf(self.vrfs[vrf]),
+                        self.host_names(mask),
+                        int_to_mac(mac),
+                    )
+
+
+async def correlate(args: ArgumentParser) -> None:
+    """stream every endpoint from each APIC into an EndpointIndex and print
+    the MACs and IPs found in more than one fabric or with conflicting owners.
+
+    Args:
+        args (ArgumentParser): the arguments passed when running the script
+    """
+    start = time.perf_counter()
+    inventory = Inventory()
+    await asyncio.gather(
+        *[
+            build_sessions(
+                item=item,
+                username=SETTINGS["INVENTORY_USERNAME"],
+                password=SETTINGS["INVENTORY_PASSWORD"],
+            )
+            for item in inventory.items
+        ]
+    )
+
+    index = EndpointIndex()
+    skipped_hosts = []
+
+    async def consume(item) -> None:
+        async for host_resp in query_clients_paged(
+            item=item, query=CORRELATE_QUERY, page_size=args.page_size
+        ):
+            if host_resp["resp"] is None:
+                skipped_hosts.append(item.name)
+                return
+            index.add(host=item.name, imdata=host_resp["resp"]["imdata"])
+
+    try:
+        await asyncio.gather(*[consume(item) for item in inventory.items])
+    finally:
+        await close_sessions(
+            items=inventory.items, username=SETTINGS["INVENTORY_USERNAME"]
+        )
+
+    time_taken = f"{time.perf_counter() - start:.2f}"
+    logger.info(
+        f"Indexed {len(index.macs)} MACs and {len(index.ips) + len(index.ip_conflicts)} IPs."
+    )
+    print_results(
+        field_names=CORRELATE_FIELDS,
+        rows=index.iter_rows(scope=args.scope),
+        skipped_hosts=skipped_hosts,
+        query=args,
+        time_taken=time_taken,
+    )
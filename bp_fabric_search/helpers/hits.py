@@ -0,0 +1,53 @@
+import json
+from typing import List
+
+from bp_fabric_search.helpers.config import SETTINGS
+from bp_fabric_search.helpers.logging import logger
+from bp_fabric_search.inventory import InventoryItem
+
+
+def load_hits() -> dict:
+    """load how many searches each host has returned results for
+
+    Returns:
+        dict: mapping of host name to hit count
+    """
+    try:
+        with open(SETTINGS["HITS_PATH"], "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError) as e:
+        logger.debug(f"Unable to load hit counts from: {SETTINGS['HITS_PATH']}")
+        logger.debug(e)
+        return {}
+
+
+def record_hits(data: list) -> None:
+    """increment the hit count of every host that returned results
+
+    Args:
+        data (list): list of apic responses
+    """
+    hits = load_hits()
+    for host_resp in data:
+        if host_resp["resp"] is not None and host_resp["resp"]["imdata"]:
+            hits[host_resp["host"]] = hits.get(host_resp["host"], 0) + 1
+
+    try:
+        with open(SETTINGS["HITS_PATH"], "w") as f:
+            json.dump(hits, f)
+    except OSError as e:
+        logger.debug(f"Unable to save hit counts to: {SETTINGS['HITS_PATH']}")
+        logger.debug(e)
+
+
+def order_by_hits(items: List[InventoryItem]) -> List[InventoryItem]:
+    """order inventory items by how often they have returned results
+
+    Args:
+        items (List[InventoryItem]): the inventory items to order
+
+    Returns:
+        List[InventoryItem]: the items, most likely to return results first
+    """
+    hits = load_hits()
+    return sorted(items, key=lambda item: hits.get(item.name, 0), reverse=True)
@@ -0,0 +1,29 @@
+def mac_to_int(mac: str) -> int:
+    """convert a MAC address in any common notation to an integer
+
+    Args:
+        mac (str): MAC address for example: 00:50:56:85:EF:89
+
+    Raises:
+        ValueError: Error raised if the value is not a MAC address
+
+    Returns:
+        int: the 48 bit MAC address
+    """
+    digits = "".join(c for c in mac if c not in ":-.")
+    if len(digits) != 12:
+        raise ValueError(f"Invalid MAC address: {mac}")
+    return int(digits, 16)
+
+
+def int_to_mac(mac: int) -> str:
+    """convert an integer back to the APIC MAC address notation
+
+    Args:
+        mac (int): the 48 bit MAC address
+
+    Returns:
+        str: MAC address for example: 00:50:56:85:EF:89
+    """
+    digits = f"{mac:012X}"
+    return ":".join(digits[i : i + 2] for i in range(0, 12, 2))
@@ -0,0 +1,207 @@
+import asyncio
+import json
+import time
+from argparse import ArgumentParser
+from functools import partial
+from typing import Awaitable, Callable, List, Optional
+
+from bp_fabric_search.helpers.addresses import is_network
+from bp_fabric_search.helpers.apic import (add_paging, build_route_filter,
+                                           query_clients, query_clients_paged,
+                                           query_network, route_family)
+from bp_fabric_search.helpers.config import SETTINGS
+from bp_fabric_search.helpers.logging import logger
+from bp_fabric_search.inventory import InventoryItem
+
+NODE_QUERY = '/node/class/fabricNode.json?query-target-filter=or(eq(fabricNode.role,"leaf"),eq(fabricNode.role,"spine"))&order-by=fabricNode.dn'
+
+# node lists rarely change, refresh them once a day
+NODE_CACHE_TTL = 86400
+
+# switches queried at once per APIC when --concurrency is not set
+NODE_QUERY_CONCURRENCY = 8
+
+
+def load_node_cache() -> dict:
+    """load the cached node lists of every host
+
+    Returns:
+        dict: mapping of host name to the cache time and node DNs
+    """
+    try:
+        with open(SETTINGS["NODE_CACHE_PATH"], "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError) as e:
+        logger.debug(f"Unable to load node cache from: {SETTINGS['NODE_CACHE_PATH']}")
+        logger.debug(e)
+        return {}
+
+
+def save_node_cache(cache: dict) -> None:
+    """save the node lists of every host
+
+    Args:
+        cache (dict): mapping of host name to the cache time and node DNs
+    """
+    try:
+        with open(SETTINGS["NODE_CACHE_PATH"], "w") as f:
+            json.dump(cache, f)
+    except OSError as e:
+        logger.debug(f"Unable to save node cache to: {SETTINGS['NODE_CACHE_PATH']}")
+        logger.debug(e)
+
+
+async def get_nodes(item: InventoryItem, refresh: bool = False) -> Optional[List[str]]:
+    """return the leaf and spine DNs of a host, using the cache where possible
+
+    Args:
+        item (InventoryItem): Generated inventory item for host loaded from inventory.yml file.
+        refresh (bool): ignore the cache and fetch the node list from the APIC
+
+    Returns:
+        Optional[List[str]]: node DNs for example: topology/pod-1/node-101, None
+            if the node list could not be fetched and there is no cached copy
+    """
+    cache = load_node_cache()
+    cached = cache.get(item.name)
+    if not refresh and cached and time.time() - cached["timestamp"] < NODE_CACHE_TTL:
+        return cached["nodes"]
+
+    logger.info(f"Refreshing node list for host: {item.name}")
+    nodes = []
+    async for host_resp in query_clients_paged(
+        item=item, query=NODE_QUERY, page_size=1000
+    ):
+        if host_resp["resp"] is None:
+            # fall back to a stale list rather than nothing
+            return cached["nodes"] if cached else None
+        nodes.extend(
+            entry["fabricNode"]["attributes"]["dn"]
+            for entry in host_resp["resp"]["imdata"]
+        )
+
+    # reload in case another host updated the cache while this one was fetching
+    cache = load_node_cache()
+    cache[item.name] = dict(timestamp=time.time(), nodes=nodes)
+    save_node_cache(cache)
+    return nodes
+
+
+def build_node_route_queries(
+    args: ArgumentParser, nodes: List[str], page_size: Optional[int] = None
+) -> List[str]:
+    """Generate a node scoped route query for each node and VRF
+
+    Args:
+        args (ArgumentParser): the arguements passed when running the script
+        nodes (List[str]): node DNs to query
+        page_size (Optional[int]): limit each query to a single page of this size
+
+    Returns:
+        List[str]: query strings to run against APIC
+    """
+    family = route_family(prefix=args.prefix)
+    query = build_route_filter(args=args)
+    # without a VRF query the whole routing tree of the node
+    doms = [f"/dom-{vrf.strip()}" for vrf in args.vrf.split(",")] if args.vrf else [""]
+    queries = [
+        f"/node/mo/{node}/sys/{family}{dom}.json?query-target=subtree&target-subtree-class={family}Route&{query}&rsp-subtree=children&rsp-subtree-class={family}Nexthop&rsp-subtree-include=required"
+        for node in nodes
+        for dom in doms
+    ]
+    if page_size:
+        return [add_paging(query=query, page_size=page_size) for query in queries]
+    return queries
+
+
+async def query_route_nodes(
+    item: InventoryItem, args: ArgumentParser, page_size: Optional[int] = None
+) -> dict:
+    """run node scoped route queries against each switch of a host in
+    parallel and merge the responses.
+
+    Args:
+        item (InventoryItem): Generated inventory item for host loaded from inventory.yml file.
+        args (ArgumentParser): the arguements passed when running the script
+        page_size (Optional[int]): limit each node query to a single page of this size
+
+    Returns:
+        dict: the merged JSON response object from the APIC
+    """
+    # Skip items with no authenticated client
+    if item.client is None:
+        logger.debug(
+            f"{item.name} has no authenticated client and as such no query will be run."
+        )
+        return dict(host=item.name, resp=None)
+
+    nodes = await get_nodes(item=item)
+    if nodes is None:
+        logger.error(f"Unable to fetch the node list for host: {item.name}")
+        return dict(host=item.name, resp=None)
+    if args.node:
+        node_ids = [f"node-{node_id.strip()}" for node_id in args.node.split(",")]
+        selected = [node for node in nodes if node.split("/")[-1] in node_ids]
+        # a requested node missing from the cache may have been added since
+        if len(selected) < len(node_ids):
+            nodes = await get_nodes(item=item, refresh=True) or nodes
+            selected = [node for node in nodes if node.split("/")[-1] in node_ids]
+        nodes = selected
+
+    semaphore = asyncio.Semaphore(args.concurrency or NODE_QUERY_CONCURRENCY)
+
+    async def query_node(query: str) -> dict:
+        async with semaphore:
+            return await query_clients(item=item, query=query)
+
+    node_resp = await asyncio.gather(
+        *[
+            query_node(query)
+            for query in build_node_route_queries(
+                args=args, nodes=nodes, page_size=page_size
+            )
+        ]
+    )
+    # a partial result would look like the missing routes had been withdrawn,
+    # skip the host instead
+    failed = [resp for resp in node_resp if resp["resp"] is None]
+    if failed:
+        logger.error(
+            f"{len(failed)} of {len(node_resp)} node queries failed for host: {item.name}"
+        )
+        return dict(host=item.name, resp=None)
+
+    imdata = [
+        entry
+        for resp in node_resp
+        if resp["resp"] is not None
+        for entry in resp["resp"]["imdata"]
+    ]
+    return dict(host=item.name, resp=dict(totalCount=str(len(imdata)), imdata=imdata))
+
+
+def build_search(
+    args: ArgumentParser, query: str, page_size: Optional[int] = None
+) -> Callable[..., Awaitable[dict]]:
+    """return the function used to search a single host
+
+    Args:
+        args (ArgumentParser): the arguements passed when running the script
+        query (str): query string to run against APIC
+        page_size (Optional[int]): limit the search to a single page of this size,
+            network searches are filtered locally so are never paged
+
+    Returns:
+        Callable[..., Awaitable[dict]]: called with an inventory item to run the search
+    """
+    if args.subparser_name == "route" and args.per_node:
+        return partial(query_route_nodes, args=args, page_size=page_size)
+    if (
+        args.subparser_name == "ip"
+        and args.ip_network
+        and is_network(value=args.ip_network)
+    ):
+        return partial(query_network, query=query, network=args.ip_network)
+    if page_size:
+        query = add_paging(query=query, page_size=page_size)
+    return partial(query_clients, query=query)
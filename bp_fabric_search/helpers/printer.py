@@ -1,7 +1,62 @@
-from prettytable import PrettyTable
-
+import heapq
+import itertools
+import os
+import shutil
+import subprocess
+import sys
+from argparse import ArgumentParser
+from contextlib import contextmanager
+from typing import Iterable, Iterator, Optional, TextIO
+
+from bp_fabric_search.helpers.addresses import AddressArray
 from bp_fabric_search.helpers.logging import logger
 
+# column widths are estimated from this many rows, later rows are truncated
+TABLE_SAMPLE_SIZE = 1000
+MAX_COLUMN_WIDTH = 48
+# narrowest column that still fits a character and the truncation ellipsis
+MIN_COLUMN_WIDTH = 4
+DEFAULT_PAGER = "less -FRSX"
+
+# columns holding IPv4/IPv6 addresses or prefixes, sorted numerically and never
+# truncated, sized to fit any IPv4 prefix even if the sample has no addresses
+ADDRESS_FIELDS = ["IP", "Route", "Next Hop", "Address"]
+ADDRESS_COLUMN_WIDTH = len("255.255.255.255/32")
+
+ENDPOINT_FIELDS = [
+    "Host",
+    "MAC",
+    "IP",
+    "Tenant",
+    "EPG",
+    "Encap",
+    "Node",
+    "Interface",
+    "Source",
+]
+
+ROUTE_FIELDS = [
+    "Host",
+    "Route",
+    "Type",
+    "Metric",
+    "Pref",
+    "Next Hop",
+    "Node",
+    "Interface",
+    "Vrf",
+]
+
+HISTORY_FIELDS = [
+    "Time",
+    "Host",
+    "MAC",
+    "IP",
+    "Encap",
+    "Node",
+    "Interface",
+]
+
 
 def build_endpoint_table_row(host: str, resp_entry: dict) -> tuple:
     """build out table frow for endpoint search data
@@ -94,29 +149,31 @@ def build_route_table_row(host: str, resp_entry: dict) -> tuple:
 
     Args:
         host (str): the hostname from the query
-        resp_entry (dict): an uribv4Route line entry from the resp data
+        resp_entry (dict): an uribv4Route or uribv6Route line entry from the resp data
 
     Returns:
         tuple: return a tuple of the table row to be added
     """
+    route_class = "uribv6Route" if "uribv6Route" in resp_entry else "uribv4Route"
+    nexthop_class = route_class.replace("Route", "Nexthop")
 
     # Set Default Data
-    route = resp_entry["uribv4Route"]["attributes"]["prefix"]
+    route = resp_entry[route_class]["attributes"]["prefix"]
     metric = []
     pref = []
-    node = resp_entry["uribv4Route"]["attributes"]["dn"].split("/")[2].split("-")[-1]
+    node = resp_entry[route_class]["attributes"]["dn"].split("/")[2].split("-")[-1]
     next_hop = []
     interface = []
     route_type = []
     vrf = []
 
-    for next_hops in resp_entry["uribv4Route"]["children"]:
-        next_hop.append(next_hops["uribv4Nexthop"]["attributes"]["addr"])
-        interface.append(next_hops["uribv4Nexthop"]["attributes"]["if"])
-        metric.append(next_hops["uribv4Nexthop"]["attributes"]["metric"])
-        pref.append(next_hops["uribv4Nexthop"]["attributes"]["pref"])
-        route_type.append(next_hops["uribv4Nexthop"]["attributes"]["routeType"])
-        vrf.append(next_hops["uribv4Nexthop"]["attributes"]["vrf"])
+    for next_hops in resp_entry[route_class]["children"]:
+        next_hop.append(next_hops[nexthop_class]["attributes"]["addr"])
+        interface.append(next_hops[nexthop_class]["attributes"]["if"])
+        metric.append(next_hops[nexthop_class]["attributes"]["metric"])
+        pref.append(next_hops[nexthop_class]["attributes"]["pref"])
+        route_type.append(next_hops[nexthop_class]["attributes"]["routeType"])
+        vrf.append(next_hops[nexthop_class]["attributes"]["vrf"])
 
     return (
         host,
@@ -131,6 +188,328 @@ def build_route_table_row(host: str, resp_entry: dict) -> tuple:
     )
 
 
+def get_table_layout(query: ArgumentParser) -> tuple:
+    """return the table columns and row builder for a query type
+
+    Args:
+        query (ArgumentParser): the arguments used to build the query
+
+    Returns:
+        tuple: the field names and the function used to build each row
+    """
+    if query.subparser_name == "route":
+        return ROUTE_FIELDS, build_route_table_row
+    return ENDPOINT_FIELDS, build_endpoint_table_row
+
+
+def iter_table_rows(data: list, query: ArgumentParser) -> Iterator[tuple]:
+    """lazily build the table rows for a set of apic responses, skipping hosts
+    without a response.
+
+    Args:
+        data (list): list of apic responses
+        query (ArgumentParser): the arguments used to build the query
+
+    Yields:
+        tuple: a table row
+    """
+    _, build_row = get_table_layout(query=query)
+    for host_resp in data:
+        if host_resp["resp"] is None:
+            continue
+        for entry in host_resp["resp"]["imdata"]:
+            yield build_row(host=host_resp["host"], resp_entry=entry)
+
+
+def build_table_rows(data: list, query: ArgumentParser) -> tuple:
+    """build the table rows for a set of apic responses
+
+    Args:
+        data (list): list of apic responses
+        query (ArgumentParser): the arguments used to build the query
+
+    Returns:
+        tuple: the field names, the table rows and a list of skipped hosts
+    """
+    field_names, _ = get_table_layout(query=query)
+    rows = list(iter_table_rows(data=data, query=query))
+    skipped_hosts = [
+        host_resp["host"] for host_resp in data if host_resp["resp"] is None
+    ]
+    return field_names, rows, skipped_hosts
+
+
+def sort_key(cell: str) -> tuple:
+    """sort numeric cells by value and everything else alphabetically
+
+    Args:
+        cell (str): the table cell
+
+    Returns:
+        tuple: the key to sort the cell on
+    """
+    if cell.isdigit():
+        return (0, int(cell), "")
+    return (1, 0, cell.lower())
+
+
+def select_rows(
+    field_names: list,
+    rows: Iterable[tuple],
+    limit: Optional[int] = None,
+    sort: Optional[str] = None,
+    reverse: bool = False,
+    columns: Optional[str] = None,
+) -> tuple:
+    """sort, limit and project table rows without materialising more rows
+    than are going to be shown.
+
+    Args:
+        field_names (list): the table column names
+        rows (Iterable[tuple]): the table rows
+        limit (Optional[int]): the maximum number of rows to return
+        sort (Optional[str]): the column to sort on
+        reverse (bool): whether to sort in descending order
+        columns (Optional[str]): comma separated list of columns to return
+
+    Raises:
+        ValueError: Error raised if a column name is unknown
+
+    Returns:
+        tuple: the selected field names and an iterable of the selected rows
+    """
+    index = {name.lower(): i for i, name in enumerate(field_names)}
+
+    def column_index(name: str) -> int:
+        if name.strip().lower() not in index:
+            raise ValueError(
+                f"Unknown column: {name}, expected one of: {', '.join(field_names)}"
+            )
+        return index[name.strip().lower()]
+
+    if sort and field_names[column_index(sort)] in ADDRESS_FIELDS:
+        # sort on the first address of each cell as fixed width integers
+        sort_index = column_index(sort)
+        rows = list(rows)
+        addresses = AddressArray.from_strings(
+            str(row[sort_index]).split("\n")[0] for row in rows
+        )
+        order = addresses.argsort(reverse=reverse)
+        rows = [rows[index] for index in order[:limit]]
+    elif sort:
+        sort_index = column_index(sort)
+
+        def key(row: tuple) -> tuple:
+            return sort_key(row[sort_index])
+
+        if limit:
+            # a bounded heap keeps the top N rows in O(n log N)
+            select = heapq.nlargest if reverse else heapq.nsmallest
+            rows = select(limit, rows, key=key)
+        else:
+            rows = sorted(rows, key=key, reverse=reverse)
+    elif limit:
+        rows = itertools.islice(rows, limit)
+
+    if columns:
+        indexes = [column_index(name) for name in columns.split(",")]
+        field_names = [field_names[i] for i in indexes]
+        rows = (tuple(row[i] for i in indexes) for row in rows)
+
+    return field_names, rows
+
+
+def format_cell(line: str, width: int, truncate: bool = True) -> str:
+    """center a single line of a cell, truncating it if it is too wide
+
+    Args:
+        line (str): the line to format
+        width (int): the column width, at least MIN_COLUMN_WIDTH
+        truncate (bool): whether a line wider than the column is truncated
+
+    Returns:
+        str: the formatted line
+    """
+    if truncate and len(line) > width:
+        line = line[: width - 3] + "..."
+    return line.center(width)
+
+
+def render_table(
+    field_names: list,
+    rows: Iterable[tuple],
+    stream: Optional[TextIO] = None,
+    sample_size: int = TABLE_SAMPLE_SIZE,
+    max_width: int = MAX_COLUMN_WIDTH,
+) -> int:
+    """write a table incrementally, column widths are estimated from the first
+    sample_size rows and wider cells in later rows are truncated. Address
+    cells are never truncated, a later address wider than its column (an IPv6
+    address after an IPv4 only sample) is written in full.
+
+    Args:
+        field_names (list): the table column names
+        rows (Iterable[tuple]): the table rows
+        stream (Optional[TextIO]): where to write the table, default stdout
+        sample_size (int): how many rows to size the columns from
+        max_width (int): the maximum width of a column
+
+    Returns:
+        int: the number of rows written
+    """
+    stream = stream or sys.stdout
+    rows = iter(rows)
+    sample = list(itertools.islice(rows, sample_size))
+
+    widths = [len(name) for name in field_names]
+    for row in sample:
+        for i, cell in enumerate(row):
+            for line in str(cell).split("\n"):
+                widths[i] = max(widths[i], len(line))
+    widths = [
+        max(width, ADDRESS_COLUMN_WIDTH)
+        if name in ADDRESS_FIELDS
+        else max(min(width, max_width), MIN_COLUMN_WIDTH)
+        for name, width in zip(field_names, widths)
+    ]
+    truncate = [name not in ADDRESS_FIELDS for name in field_names]
+
+    border = "+" + "+".join("-" * (width + 2) for width in widths) + "+\n"
+
+    def write_row(row: tuple) -> None:
+        cells = [str(cell).split("\n") for cell in row]
+        for line_number in range(max(len(lines) for lines in cells)):
+            line = [
+                format_cell(
+                    lines[line_number] if line_number < len(lines) else "",
+                    width,
+                    truncate=can_truncate,
+                )
+                for lines, width, can_truncate in zip(cells, widths, truncate)
+            ]
+            stream.write("| " + " | ".join(line) + " |\n")
+
+    stream.write(border)
+    write_row(field_names)
+    stream.write(border)
+    count = 0
+    for row in itertools.chain(sample, rows):
+        write_row(row)
+        count += 1
+    stream.write(border)
+    return count
+
+
+@contextmanager
+def open_output(use_pager: bool = True) -> Iterator[TextIO]:
+    """open a stream to write output to, piped through a pager when stdout is a
+    terminal. The pager is taken from the PAGER environment variable, an empty
+    PAGER disables paging.
+
+    Args:
+        use_pager (bool): whether a pager should be used if available
+
+    Yields:
+        TextIO: the stream to write to
+    """
+    pager = os.environ.get("PAGER", DEFAULT_PAGER).strip()
+    if (
+        not use_pager
+        or not pager
+        or not sys.stdout.isatty()
+        or not shutil.which(pager.split()[0])
+    ):
+        yield sys.stdout
+        return
+
+    process = subprocess.Popen(pager, shell=True, stdin=subprocess.PIPE, text=True)
+    try:
+        yield process.stdin
+    except BrokenPipeError:
+        # the user quit the pager before all the output was written
+        pass
+    finally:
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        process.wait()
+
+
+def print_rows(field_names: list, rows: Iterable[tuple]) -> None:
+    """Prettyprint a set of prebuilt table rows to the users screen
+
+    Args:
+        field_names (list): the table column names
+        rows (Iterable[tuple]): the table rows to print
+    """
+    render_table(field_names=field_names, rows=rows)
+
+
+def print_table(data: list, query: ArgumentParser, time_taken: str) -> None:
+    """Prettyprint the responses to the users screen, applying the limit, sort
+    and columns options of the query.
+
+    Args:
+        data (list): list of apic responses
+        query (ArgumentParser): the arguments used to build the query
+        time_taken (str): how long the query took
+    """
+    field_names, _ = get_table_layout(query=query)
+    skipped_hosts = [
+        host_resp["host"] for host_resp in data if host_resp["resp"] is None
+    ]
+    print_results(
+        field_names=field_names,
+        rows=iter_table_rows(data=data, query=query),
+        skipped_hosts=skipped_hosts,
+        query=query,
+        time_taken=time_taken,
+    )
+
+
+def print_results(
+    field_names: list,
+    rows: Iterable[tuple],
+    skipped_hosts: list,
+    query: ArgumentParser,
+    time_taken: str,
+) -> None:
+    """Prettyprint prebuilt table rows with the query summary, applying the
+    limit, sort and columns options of the query.
+
+    Args:
+        field_names (list): the table column names
+        rows (Iterable[tuple]): the table rows
+        skipped_hosts (list): hosts that did not respond
+        query (ArgumentParser): the arguments used to build the query
+        time_taken (str): how long the query took
+    """
+    try:
+        field_names, rows = select_rows(
+            field_names=field_names,
+            rows=rows,
+            limit=query.limit,
+            sort=query.sort,
+            reverse=query.reverse,
+            columns=query.columns,
+        )
+    except ValueError as e:
+        logger.error(e)
+        return
+
+    with open_output(use_pager=not query.no_pager) as stream:
+        stream.write("\n\n")
+        if skipped_hosts:
+            stream.write(f"Skipped Hosts: {', '.join(skipped_hosts)}\n")
+        stream.write(f"Query Type: {query.subparser_name}\n")
+        stream.write(f"Time taken: {time_taken} seconds.\n")
+        stream.write("\n\n")
+        count = render_table(field_names=field_names, rows=rows, stream=stream)
+        if query.limit and count == query.limit:
+            stream.write(f"Showing the first {count} results.\n")
+
+
 def print_endpoint_table(data: list, query: str, time_taken: str) -> None:
     """Prettyprint the responses to the users screen
 
@@ -300,40 +679,7 @@ def print_endpoint_table(data: list, query: str, time_taken: str) -> None:
         data (list): list of apic responses
     """
 
-    table = PrettyTable()
-
-    table.field_names = [
-        "Host",
-        "MAC",
-        "IP",
-        "Tenant",
-        "EPG",
-        "Encap",
-        "Node",
-        "Interface",
-        "Source",
-    ]
-    skipped_hosts = []
-
-    for host_resp in data:
-        if host_resp["resp"] is None:
-            skipped_hosts.append(host_resp["host"])
-            continue
-
-        table.add_rows(
-            [
-                build_endpoint_table_row(host=host_resp["host"], resp_entry=entry)
-                for entry in host_resp["resp"]["imdata"]
-            ]
-        )
-
-    print("\n")
-    if skipped_hosts:
-        print(f"Skipped Hosts: {', '.join(skipped_hosts)}")
-    print(f"Query Type: {query.subparser_name}")
-    print(f"Time taken: {time_taken} seconds.")
-    print("\n")
-    print(table)
+    print_table(data=data, query=query, time_taken=time_taken)
 
 
 def print_route_table(data: list, query: str, time_taken: str) -> None:
@@ -347,37 +693,31 @@ def print_route_table(data: list, query: str, time_taken: str) -> None:
         data (list): list of apic responses
     """
 
-    table = PrettyTable()
-
-    table.field_names = [
-        "Host",
-        "Route",
-        "Type",
-        "Metric",
-        "Pref",
-        "Next Hop",
-        "Node",
-        "Interface",
-        "Vrf",
-    ]
-    skipped_hosts = []
+    print_table(data=data, query=query, time_taken=time_taken)
 
-    for host_resp in data:
-        if host_resp["resp"] is None:
-            skipped_hosts.append(host_resp["host"])
-            continue
 
-        table.add_rows(
-            [
-                build_route_table_row(host=host_resp["host"], resp_entry=entry)
-                for entry in host_resp["resp"]["imdata"]
-            ]
+def print_history_table(records: list, query: ArgumentParser) -> None:
+    """Prettyprint endpoint location history to the users screen
+
+    Args:
+        records (list): location records as returned by HistoryStore.query_mac
+        query (ArgumentParser): the arguments used to query the history
+    """
+    rows = [
+        (
+            record["timestamp"].strftime("%Y-%m-%d %H:%M:%S"),
+            record["host"],
+            record["mac"],
+            record["ip"],
+            record["encap"],
+            record["node"],
+            record["interface"],
         )
+        for record in records
+    ]
 
     print("\n")
-    if skipped_hosts:
-        print(f"Skipped Hosts: {', '.join(skipped_hosts)}")
     print(f"Query Type: {query.subparser_name}")
-    print(f"Time taken: {time_taken} seconds.")
+    print(f"Locations in the last {query.days} days: {len(rows)}")
     print("\n")
-    print(table)
+    print_rows(field_names=HISTORY_FIELDS, rows=rows)
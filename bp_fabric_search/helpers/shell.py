@@ -0,0 +1,269 @@
+import asyncio
+import concurrent.futures
+import shlex
+import threading
+import time
+from argparse import ArgumentParser
+from typing import Any, Callable, Coroutine, List
+
+from bp_fabric_search.helpers.apic import (build_query, build_sessions,
+                                           close_sessions, keep_sessions_alive)
+from bp_fabric_search.helpers.config import SETTINGS
+from bp_fabric_search.helpers.nodes import build_search
+from bp_fabric_search.helpers.printer import (build_table_rows, print_rows,
+                                              select_rows)
+from bp_fabric_search.inventory import Inventory
+
+SHELL_PROMPT = "fabric-search> "
+
+SHELL_HELP = """Commands:
+  mac | ip | node | route [options]   run a search, same options as the command line
+  filter TEXT | COLUMN=TEXT ...       filter the last results locally
+  last                                reprint the last results
+  help                                show this message
+  exit | quit                         leave the shell
+"""
+
+
+def filter_rows(field_names: list, rows: list, terms: List[str]) -> list:
+    """filter table rows locally, every term must match for a row to be kept
+
+    Args:
+        field_names (list): the table column names
+        rows (list): the table rows to filter
+        terms (List[str]): either free text matched against every column or
+            COLUMN=TEXT matched against a single column, case insensitive
+
+    Raises:
+        ValueError: Error raised if a term references an unknown column
+
+    Returns:
+        list: the rows matching all terms
+    """
+    columns = {name.lower(): index for index, name in enumerate(field_names)}
+    matchers = []
+    for term in terms:
+        column, sep, text = term.partition("=")
+        if sep:
+            if column.lower() not in columns:
+                raise ValueError(
+                    f"Unknown column: {column}, expected one of: {', '.join(field_names)}"
+                )
+            matchers.append((columns[column.lower()], text.lower()))
+        else:
+            matchers.append((None, term.lower()))
+
+    def is_match(row: tuple) -> bool:
+        for index, text in matchers:
+            cells = row if index is None else (row[index],)
+            if not any(text in str(cell).lower() for cell in cells):
+                return False
+        return True
+
+    return [row for row in rows if is_match(row)]
+
+
+class Shell:
+    """Interactive search shell that reuses APIC sessions across searches."""
+
+    def __init__(self, inventory: Inventory, parse_args: Callable):
+        self.inventory = inventory
+        self.parse_args = parse_args
+        self.field_names = []
+        self.rows = []
+        self.skipped_hosts = []
+
+    async def connect(self) -> None:
+        """authenticate against every APIC in the inventory"""
+        await asyncio.gather(
+            *[
+                build_sessions(
+                    item=item,
+                    username=SETTINGS["INVENTORY_USERNAME"],
+                    password=SETTINGS["INVENTORY_PASSWORD"],
+                )
+                for item in self.inventory.items
+            ]
+        )
+
+    async def search(self, args: ArgumentParser) -> None:
+        """run a search against every APIC, printing each result as it arrives
+
+        Args:
+            args (ArgumentParser): the parsed search arguments
+        """
+        start = time.perf_counter()
+        search = build_search(args=args, query=build_query(args=args))
+        self.rows = []
+        self.skipped_hosts = []
+
+        query_tasks = [
+            asyncio.create_task(search(item=item)) for item in self.inventory.items
+        ]
+        try:
+            await self.print_as_completed(args=args, query_tasks=query_tasks)
+        finally:
+            # --first stops early, cancel anything still outstanding
+            for query_task in query_tasks:
+                query_task.cancel()
+            await asyncio.gather(*query_tasks, return_exceptions=True)
+
+        if self.skipped_hosts:
+            print(f"Skipped Hosts: {', '.join(self.skipped_hosts)}")
+        print(f"Total results: {len(self.rows)}")
+        print(f"Time taken: {time.perf_counter() - start:.2f} seconds.")
+
+    async def print_as_completed(self, args: ArgumentParser, query_tasks: list) -> None:
+        """print each response as it arrives, stopping after the first host with
+        results when --first is set.
+
+        Args:
+            args (ArgumentParser): the parsed search arguments
+            query_tasks (list): the running query tasks
+        """
+        for query_task in asyncio.as_completed(query_tasks):
+            host_resp = await query_task
+            field_names, rows, skipped = build_table_rows(data=[host_resp], query=args)
+            self.field_names = field_names
+            self.skipped_hosts.extend(skipped)
+            if rows:
+                self.rows.extend(rows)
+                print(f"\n{host_resp['host']}: {len(rows)} results")
+                try:
+                    shown_fields, shown_rows = select_rows(
+                        field_names=field_names,
+                        rows=rows,
+                        limit=args.limit,
+                        sort=args.sort,
+                        reverse=args.reverse,
+                        columns=args.columns,
+                    )
+                    print_rows(field_names=shown_fields, rows=shown_rows)
+                except ValueError as e:
+                    print(e)
+                if args.first:
+                    return
+
+    def filter(self, terms: List[str]) -> None:
+        """filter the last search results locally
+
+        Args:
+            terms (List[str]): the filter terms, see filter_rows
+        """
+        if not self.field_names:
+            print("No results to filter, run a search first.")
+            return
+        try:
+            rows = filter_rows(
+                field_names=self.field_names, rows=self.rows, terms=terms
+            )
+        except ValueError as e:
+            print(e)
+            return
+        print_rows(field_names=self.field_names, rows=rows)
+        print(f"{len(rows)} of {len(self.rows)} results")
+
+    async def handle(self, line: str) -> bool:
+        """handle a single line of shell input
+
+        Args:
+            line (str): the raw input line
+
+        Returns:
+            bool: False once the shell should exit
+        """
+        try:
+            words = shlex.split(line)
+        except ValueError as e:
+            print(e)
+            return True
+
+        if not words:
+            return True
+
+        command = words[0].lower()
+        if command in ["exit", "quit"]:
+            return False
+        if command == "help":
+            print(SHELL_HELP)
+        elif command == "filter":
+            self.filter(terms=words[1:])
+        elif command == "last":
+            self.filter(terms=[])
+        elif command in ["mac", "ip", "node", "route"]:
+            # argparse exits on invalid input, keep the shell running
+            try:
+                args = self.parse_args(words)
+            except SystemExit:
+                return True
+            if args.watch:
+                print(
+                    "--watch is not supported in the shell, run it from the command line."
+                )
+                return True
+            await self.search(args=args)
+        else:
+            print(f"Unknown command: {command}, type 'help' for a list of commands.")
+
+        return True
+
+    async def close(self) -> None:
+        """cancel anything still running and close the sessions"""
+        tasks = [
+            task for task in asyncio.all_tasks() if task is not asyncio.current_task()
+        ]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await close_sessions(
+            items=self.inventory.items, username=SETTINGS["INVENTORY_USERNAME"]
+        )
+
+    def run(self) -> None:
+        """run the shell until the user exits
+
+        The event loop runs in a background thread so the sessions are kept
+        refreshed while the shell waits for input. Input is read in the main
+        thread so Ctrl-C at the prompt exits, while Ctrl-C during a search only
+        cancels that search.
+        """
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+
+        def call(coroutine: Coroutine) -> Any:
+            future = asyncio.run_coroutine_threadsafe(coroutine, loop)
+            try:
+                return future.result()
+            except KeyboardInterrupt:
+                future.cancel()
+                concurrent.futures.wait([future])
+                raise
+
+        try:
+            call(self.connect())
+            asyncio.run_coroutine_threadsafe(
+                keep_sessions_alive(
+                    items=self.inventory.items,
+                    username=SETTINGS["INVENTORY_USERNAME"],
+                    password=SETTINGS["INVENTORY_PASSWORD"],
+                ),
+                loop,
+            )
+            print(SHELL_HELP)
+            while True:
+                try:
+                    line = input(SHELL_PROMPT)
+                except EOFError:
+                    break
+                try:
+                    if not call(self.handle(line=line)):
+                        break
+                except KeyboardInterrupt:
+                    print("\nCancelled.")
+        finally:
+            asyncio.run_coroutine_threadsafe(self.close(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
@@ -0,0 +1,264 @@
+import asyncio
+import time
+from argparse import ArgumentParser, Namespace
+from datetime import datetime
+
+from bp_fabric_search.helpers.apic import (build_query, build_sessions,
+                                           close_sessions, keep_sessions_alive)
+from bp_fabric_search.helpers.config import SETTINGS
+from bp_fabric_search.helpers.logging import logger
+from bp_fabric_search.helpers.nodes import build_search
+from bp_fabric_search.helpers.printer import (get_table_layout,
+                                              print_endpoint_table,
+                                              print_route_table)
+from bp_fabric_search.inventory import Inventory
+
+# columns that identify an entry rather than describe where it currently is
+SNAPSHOT_KEY_FIELDS = ["Host", "MAC", "Route"]
+
+# columns built from each child object, compared per child rather than as the
+# joined table cell so children returned in a different order are not changes
+SNAPSHOT_CHILD_FIELDS = {
+    "fvIp": ["IP", "Encap", "Node", "Interface"],
+    "uribv4Nexthop": ["Next Hop", "Type", "Metric", "Pref", "Interface", "Vrf"],
+    "uribv6Nexthop": ["Next Hop", "Type", "Metric", "Pref", "Interface", "Vrf"],
+}
+
+
+def build_snapshot(host_resp: dict, query: ArgumentParser) -> dict:
+    """build a snapshot of a single apic response keyed on the entry DN
+
+    Args:
+        host_resp (dict): an apic response as returned by query_clients
+        query (ArgumentParser): the arguments used to build the query
+
+    Returns:
+        dict: mapping of DN to the entry's fields, a dict of column name to
+            value, and children, a dict of child DN to its own column values
+    """
+    field_names, build_row = get_table_layout(query=query)
+    snapshot = {}
+    for entry in host_resp["resp"]["imdata"]:
+        # entries are either fvCEp or uribv4/6Route objects, both carry a stable dn
+        entry_class, entry_object = next(iter(entry.items()))
+        row = build_row(host=host_resp["host"], resp_entry=entry)
+
+        children = {}
+        for child in entry_object.get("children", []):
+            child_class, child_object = next(iter(child.items()))
+            if child_class not in SNAPSHOT_CHILD_FIELDS:
+                continue
+            attributes = child_object["attributes"]
+            child_dn = (
+                attributes.get("dn") or attributes.get("rn") or attributes["addr"]
+            )
+            # build a row from the entry with only this child to reuse the table formatting
+            child_row = build_row(
+                host=host_resp["host"],
+                resp_entry={entry_class: dict(entry_object, children=[child])},
+            )
+            child_fields = dict(zip(field_names, child_row))
+            children[child_dn] = {
+                name: child_fields[name] for name in SNAPSHOT_CHILD_FIELDS[child_class]
+            }
+
+        snapshot[entry_object["attributes"]["dn"]] = dict(
+            fields=dict(zip(field_names, row)), children=children
+        )
+    return snapshot
+
+
+def diff_children(previous: dict, current: dict) -> list:
+    """compare the children of the same entry in two snapshots
+
+    Args:
+        previous (dict): mapping of child DN to column values in the earlier snapshot
+        current (dict): mapping of child DN to column values in the latest snapshot
+
+    Returns:
+        list: a description per added, removed or changed child
+    """
+    moves = []
+    for child_dn in sorted(current.keys() | previous.keys()):
+        before = previous.get(child_dn)
+        after = current.get(child_dn)
+        if before is None:
+            moves.append(f"added {format_fields(after)}")
+        elif after is None:
+            moves.append(f"removed {format_fields(before)}")
+        else:
+            # the first column identifies the child, for example the IP
+            label_name, label = next(iter(after.items()))
+            moves.extend(
+                f"{label_name.lower()}={label} {name.lower()} {format_value(before[name])} -> {format_value(value)}"
+                for name, value in after.items()
+                if value != before[name]
+            )
+    return moves
+
+
+def diff_snapshots(host: str, previous: dict, current: dict) -> list:
+    """compare two snapshots of the same host and describe the differences
+
+    Args:
+        host (str): the hostname the snapshots were taken from
+        previous (dict): the earlier snapshot
+        current (dict): the latest snapshot
+
+    Returns:
+        list: a line per added, removed or changed entry
+    """
+    changes = []
+    for dn in current.keys() - previous.keys():
+        changes.append(f"+ {host} {dn} {format_fields(current[dn]['fields'])}")
+
+    for dn in previous.keys() - current.keys():
+        changes.append(f"- {host} {dn} {format_fields(previous[dn]['fields'])}")
+
+    for dn in current.keys() & previous.keys():
+        before, after = previous[dn], current[dn]
+        child_names = {
+            name
+            for children in [before["children"], after["children"]]
+            for child in children.values()
+            for name in child
+        }
+        moves = [
+            f"{name.lower()} {format_value(before['fields'][name])} -> {format_value(value)}"
+            for name, value in after["fields"].items()
+            if name not in child_names and value != before["fields"][name]
+        ]
+        moves.extend(
+            diff_children(previous=before["children"], current=after["children"])
+        )
+        if moves:
+            changes.append(f"~ {host} {dn} {', '.join(moves)}")
+
+    return sorted(changes, key=lambda change: change[2:])
+
+
+def update_snapshots(snapshots: dict, query_resp: list, query: ArgumentParser) -> list:
+    """replace the snapshot of each host that responded and describe what
+    changed since its previous snapshot.
+
+    Args:
+        snapshots (dict): mapping of host to its latest snapshot, updated in place
+        query_resp (list): the apic responses of a single poll
+        query (ArgumentParser): the arguments used to build the query
+
+    Returns:
+        list: a line per added, removed or changed entry across every host
+    """
+    changes = []
+    for host_resp in query_resp:
+        # keep the last known state for hosts that failed to respond
+        if host_resp["resp"] is None:
+            continue
+        snapshot = build_snapshot(host_resp=host_resp, query=query)
+        if host_resp["host"] in snapshots:
+            changes.extend(
+                diff_snapshots(
+                    host=host_resp["host"],
+                    previous=snapshots[host_resp["host"]],
+                    current=snapshot,
+                )
+            )
+        snapshots[host_resp["host"]] = snapshot
+    return changes
+
+
+def format_value(value: str) -> str:
+    """format a multi line table cell on a single line
+
+    Args:
+        value (str): the table cell
+
+    Returns:
+        str: the cell with each line comma separated, or - if empty
+    """
+    return value.replace("\n", ",") if value else "-"
+
+
+def format_fields(fields: dict) -> str:
+    """format the non key fields of a snapshot entry on a single line
+
+    Args:
+        fields (dict): mapping of column name to value
+
+    Returns:
+        str: space separated name=value pairs
+    """
+    return " ".join(
+        f"{name.lower()}={format_value(value)}"
+        for name, value in fields.items()
+        if name not in SNAPSHOT_KEY_FIELDS and value
+    )
+
+
+async def watch(args: ArgumentParser) -> None:
+    """repeat a search on an interval and print only what changed
+
+    Args:
+        args (ArgumentParser): the arguments passed when running the script
+    """
+    inventory = Inventory()
+    await asyncio.gather(
+        *[
+            build_sessions(
+                item=item,
+                username=SETTINGS["INVENTORY_USERNAME"],
+                password=SETTINGS["INVENTORY_PASSWORD"],
+            )
+            for item in inventory.items
+        ]
+    )
+    refresh_task = asyncio.create_task(
+        keep_sessions_alive(
+            items=inventory.items,
+            username=SETTINGS["INVENTORY_USERNAME"],
+            password=SETTINGS["INVENTORY_PASSWORD"],
+        )
+    )
+
+    search = build_search(args=args, query=build_query(args=args))
+    snapshots = {}
+    first_poll = True
+
+    try:
+        while True:
+            start = time.perf_counter()
+            query_resp = await asyncio.gather(
+                *[search(item=item) for item in inventory.items]
+            )
+            time_taken = f"{time.perf_counter() - start:.2f}"
+
+            if first_poll:
+                # print the full result once as a baseline for the diffs, never
+                # through the pager as it would block the polling until closed
+                first_poll = False
+                baseline = Namespace(**vars(args))
+                baseline.no_pager = True
+                if args.subparser_name == "route":
+                    print_route_table(
+                        data=query_resp, query=baseline, time_taken=time_taken
+                    )
+                else:
+                    print_endpoint_table(
+                        data=query_resp, query=baseline, time_taken=time_taken
+                    )
+
+            changes = update_snapshots(
+                snapshots=snapshots, query_resp=query_resp, query=args
+            )
+
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            for change in changes:
+                print(f"{timestamp} {change}")
+            logger.debug(f"Watch poll took {time_taken} seconds.")
+
+            await asyncio.sleep(args.watch)
+    finally:
+        refresh_task.cancel()
+        await close_sessions(
+            items=inventory.items, username=SETTINGS["INVENTORY_USERNAME"]
+        )
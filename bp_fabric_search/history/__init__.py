@@ -0,0 +1,2 @@
+from .collector import collect_history
+from .store import HistoryStore
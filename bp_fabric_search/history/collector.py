@@ -0,0 +1,68 @@
+import asyncio
+import time
+from typing import Optional
+
+from bp_fabric_search.helpers.apic import (build_sessions, close_sessions,
+                                           keep_sessions_alive,
+                                           query_clients_paged)
+from bp_fabric_search.helpers.config import SETTINGS
+from bp_fabric_search.helpers.logging import logger
+from bp_fabric_search.history.store import HistoryStore
+from bp_fabric_search.inventory import Inventory
+
+HISTORY_QUERY = "/node/class/fvCEp.json?rsp-subtree=children&rsp-subtree-class=fvIp&order-by=fvCEp.dn"
+
+HISTORY_PAGE_SIZE = 10000
+
+
+async def collect_history(store: HistoryStore, interval: Optional[int] = None) -> None:
+    """pull every endpoint from each APIC into the history store
+
+    Args:
+        store (HistoryStore): the store to append the endpoint locations to
+        interval (Optional[int]): seconds between collections, collect once if unset
+    """
+    inventory = Inventory()
+    await asyncio.gather(
+        *[
+            build_sessions(
+                item=item,
+                username=SETTINGS["INVENTORY_USERNAME"],
+                password=SETTINGS["INVENTORY_PASSWORD"],
+            )
+            for item in inventory.items
+        ]
+    )
+    refresh_task = asyncio.create_task(
+        keep_sessions_alive(
+            items=inventory.items,
+            username=SETTINGS["INVENTORY_USERNAME"],
+            password=SETTINGS["INVENTORY_PASSWORD"],
+        )
+    )
+
+    async def collect(item) -> None:
+        added = 0
+        async for host_resp in query_clients_paged(
+            item=item, query=HISTORY_QUERY, page_size=HISTORY_PAGE_SIZE
+        ):
+            if host_resp["resp"] is None:
+                break
+            added += store.append(fabric=item.name, imdata=host_resp["resp"]["imdata"])
+        logger.info(f"Stored {added} new locations for host: {item.name}")
+
+    try:
+        while True:
+            start = time.perf_counter()
+            await asyncio.gather(*[collect(item) for item in inventory.items])
+            logger.info(
+                f"History collection took {time.perf_counter() - start:.2f} seconds."
+            )
+            if not interval:
+                break
+            await asyncio.sleep(interval)
+    finally:
+        refresh_task.cancel()
+        await close_sessions(
+            items=inventory.items, username=SETTINGS["INVENTORY_USERNAME"]
+        )
@@ -0,0 +1,215 @@
+import ipaddress
+import sqlite3
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional
+
+from bp_fabric_search.helpers.config import SETTINGS
+from bp_fabric_search.helpers.logging import logger
+from bp_fabric_search.helpers.macs import int_to_mac, mac_to_int
+
+# Rows are clustered on (mac, ts) so a MAC lookup is a single range scan no
+# matter how large the table grows. Repeated strings (fabric, path, encap) are
+# dictionary encoded and MAC/IP are stored as integers/packed bytes to keep
+# each row to a few dozen bytes.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS strings (
+    id INTEGER PRIMARY KEY,
+    value TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS locations (
+    mac INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    fabric INTEGER NOT NULL,
+    path INTEGER NOT NULL,
+    encap INTEGER NOT NULL,
+    ip BLOB NOT NULL,
+    PRIMARY KEY (mac, ts, fabric, path, encap, ip)
+) WITHOUT ROWID;
+"""
+
+
+def parse_timestamp(ts: str) -> int:
+    """convert an APIC timestamp to epoch seconds
+
+    Args:
+        ts (str): APIC timestamp for example: 2023-10-20T10:05:30.016+00:00
+
+    Returns:
+        int: seconds since the epoch
+    """
+    return int(datetime.fromisoformat(ts).timestamp())
+
+
+def build_history_records(resp_entry: dict) -> Iterator[tuple]:
+    """extract the location records from an fvCEp entry
+
+    Args:
+        resp_entry (dict): an fvCEp line entry from the resp data
+
+    Yields:
+        tuple: (mac, ip, fabricPathDn, encap, modTs) for every IP learnt on the
+            endpoint, or a single record without an IP for MAC only endpoints
+    """
+    attributes = resp_entry["fvCEp"]["attributes"]
+    has_ip = False
+
+    for child in resp_entry["fvCEp"].get("children", []):
+        if "fvIp" in child:
+            ip_attributes = child["fvIp"]["attributes"]
+            has_ip = True
+            encap = ip_attributes.get("encap", "unknown")
+            if encap == "unknown":
+                encap = attributes["encap"]
+            yield (
+                attributes["mac"],
+                ip_attributes["addr"],
+                ip_attributes.get("fabricPathDn") or attributes.get("fabricPathDn", ""),
+                encap,
+                ip_attributes.get("modTs") or attributes["modTs"],
+            )
+
+    if not has_ip:
+        yield (
+            attributes["mac"],
+            "",
+            attributes.get("fabricPathDn", ""),
+            attributes["encap"],
+            attributes["modTs"],
+        )
+
+
+class HistoryStore:
+    """Append only store of endpoint locations backed by sqlite."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or SETTINGS["HISTORY_PATH"]
+        self.connection = sqlite3.connect(self.path)
+        self.connection.executescript(SCHEMA)
+        self.strings = {}
+        self.values = {}
+
+    def close(self) -> None:
+        """close the underlying database"""
+        self.connection.close()
+
+    def string_id(self, value: str) -> int:
+        """return the dictionary id for a string, adding it if required
+
+        Args:
+            value (str): the string to encode
+
+        Returns:
+            int: the dictionary id
+        """
+        if value not in self.strings:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO strings (value) VALUES (?)", (value,)
+            )
+            (string_id,) = self.connection.execute(
+                "SELECT id FROM strings WHERE value = ?", (value,)
+            ).fetchone()
+            self.strings[value] = string_id
+            self.values[string_id] = value
+        return self.strings[value]
+
+    def string_value(self, string_id: int) -> str:
+        """return the string for a dictionary id
+
+        Args:
+            string_id (int): the dictionary id
+
+        Returns:
+            str: the decoded string
+        """
+        if string_id not in self.values:
+            (value,) = self.connection.execute(
+                "SELECT value FROM strings WHERE id = ?", (string_id,)
+            ).fetchone()
+            self.strings[value] = string_id
+            self.values[string_id] = value
+        return self.values[string_id]
+
+    def append(self, fabric: str, imdata: List[dict]) -> int:
+        """append the locations of a set of fvCEp entries to the store,
+        locations that are already stored with the same modTs are skipped.
+
+        Args:
+            fabric (str): the inventory name of the fabric
+            imdata (List[dict]): fvCEp entries from an APIC response
+
+        Returns:
+            int: the number of new records
+        """
+        fabric_id = self.string_id(fabric)
+        rows = []
+        for entry in imdata:
+            for mac, ip, path, encap, ts in build_history_records(entry):
+                try:
+                    rows.append(
+                        (
+                            mac_to_int(mac),
+                            parse_timestamp(ts),
+                            fabric_id,
+                            self.string_id(path),
+                            self.string_id(encap),
+                            ipaddress.ip_address(ip).packed if ip else b"",
+                        )
+                    )
+                except ValueError as e:
+                    logger.debug(f"Unable to store endpoint history for {mac}")
+                    logger.debug(e)
+
+        with self.connection:
+            before = self.connection.total_changes
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO locations VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+            return self.connection.total_changes - before
+
+    def query_mac(self, mac: str, since: datetime) -> List[dict]:
+        """return every recorded location of a MAC address since a point in time,
+        including the latest location of each fabric and IP from before that point.
+
+        Args:
+            mac (str): MAC address for example: 00:50:56:85:EF:89
+            since (datetime): the start of the window to return
+
+        Raises:
+            ValueError: Error raised if the value is not a MAC address
+
+        Returns:
+            List[dict]: the location records ordered by time
+        """
+        mac_id = mac_to_int(mac)
+        since_ts = int(since.timestamp())
+        # modTs only changes when an endpoint moves, so the latest record of
+        # each fabric and IP before the window is where it was when the window
+        # opened
+        cursor = self.connection.execute(
+            "SELECT ts, fabric, path, encap, ip FROM locations "
+            "WHERE mac = ? AND ts >= ? "
+            "UNION ALL "
+            "SELECT locations.ts, locations.fabric, path, encap, locations.ip "
+            "FROM locations JOIN ("
+            "SELECT fabric, ip, max(ts) AS ts FROM locations "
+            "WHERE mac = ? AND ts < ? GROUP BY fabric, ip"
+            ") AS latest ON locations.mac = ? AND locations.ts = latest.ts "
+            "AND locations.fabric = latest.fabric AND locations.ip = latest.ip "
+            "ORDER BY ts",
+            (mac_id, since_ts, mac_id, since_ts, mac_id),
+        )
+        records = []
+        for ts, fabric_id, path_id, encap_id, ip in cursor:
+            path = self.string_value(path_id)
+            records.append(
+                dict(
+                    timestamp=datetime.fromtimestamp(ts, tz=timezone.utc),
+                    host=self.string_value(fabric_id),
+                    mac=int_to_mac(mac_id),
+                    ip=str(ipaddress.ip_address(ip)) if ip else "",
+                    node=path.split("/")[2].split("-", 1)[-1] if path else "",
+                    interface=path.split("[")[-1].strip("]"),
+                    encap=self.string_value(encap_id)[5:],
+                )
+            )
+        return records
@@ -0,0 +1,115 @@
+import pytest
+
+from bp_fabric_search.helpers.addresses import (AddressArray, is_network,
+                                                network_mask, network_wildcard,
+                                                normalise_address,
+                                                parse_address)
+
+
+def test_parse_address_ipv4_is_mapped():
+    version, hi, lo, prefixlen = parse_address("10.96.0.0/24")
+    assert version == 4
+    assert (hi << 64) | lo == 0xFFFF0A600000
+    assert prefixlen == 120
+
+
+def test_parse_address_ipv6():
+    version, hi, lo, prefixlen = parse_address("2001:db8::1")
+    assert version == 6
+    assert hi == 0x20010DB800000000
+    assert lo == 1
+    assert prefixlen == 128
+
+
+def test_parse_address_invalid():
+    with pytest.raises(ValueError):
+        parse_address("10.96")
+
+
+@pytest.mark.parametrize(
+    "prefixlen, expected",
+    [
+        (0, (0, 0)),
+        (64, ((1 << 64) - 1, 0)),
+        (96, ((1 << 64) - 1, 0xFFFFFFFF00000000)),
+        (128, ((1 << 64) - 1, (1 << 64) - 1)),
+    ],
+)
+def test_network_mask_edges(prefixlen, expected):
+    assert network_mask(prefixlen) == expected
+
+
+@pytest.mark.parametrize(
+    "network, expected",
+    [
+        ("10.96.0.0/16", "10.96."),
+        ("10.96.1.0/20", "10.96."),
+        ("0.0.0.0/0", "."),
+        ("2001:db8::/32", "2001:db8:"),
+        ("2001:0:1::/48", ":"),
+    ],
+)
+def test_network_wildcard(network, expected):
+    assert network_wildcard(network) == expected
+
+
+def test_in_network_ipv4():
+    addresses = AddressArray.from_strings(
+        ["10.0.0.1", "10.255.255.255", "11.0.0.1", "invalid"]
+    )
+    assert addresses.in_network("10.0.0.0/8") == [0, 1]
+
+
+def test_in_network_prefix_edges():
+    addresses = AddressArray.from_strings(["10.0.0.1", "10.0.0.2", "2001:db8::1"])
+    assert addresses.in_network("0.0.0.0/0") == [0, 1]
+    assert addresses.in_network("::/0") == [2]
+    assert addresses.in_network("10.0.0.1/32") == [0]
+    assert addresses.in_network("2001:db8::1/128") == [2]
+    assert addresses.in_network("2001:db8::2/128") == []
+
+
+def test_in_network_keeps_families_apart():
+    addresses = AddressArray.from_strings(["::ffff:10.0.0.2", "10.0.0.1"])
+    assert addresses.in_network("10.0.0.0/8") == [1]
+    assert addresses.in_network("::ffff:0:0/96") == [0]
+
+
+def test_argsort_numeric_with_invalid_last():
+    addresses = AddressArray.from_strings(
+        ["10.0.0.10", "", "2001:db8::1", "10.0.0.9", "n/a", "::ffff:10.0.0.1"]
+    )
+    assert addresses.argsort() == [3, 0, 5, 2, 1, 4]
+    assert addresses.argsort(reverse=True) == [2, 5, 0, 3, 1, 4]
+
+
+def test_argsort_prefix_length_breaks_ties():
+    addresses = AddressArray.from_strings(["10.0.0.0/24", "10.0.0.0/16", "10.0.0.0"])
+    assert addresses.argsort() == [1, 0, 2]
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("10.96.0.0/16", True),
+        ("10.96.1.1", True),
+        ("2001:db8::/32", True),
+        ("10.96", False),
+        ("10.96.", False),
+    ],
+)
+def test_is_network(value, expected):
+    assert is_network(value) == expected
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("2001:DB8:0:0::10", "2001:db8::10"),
+        ("2001:0db8:0000:0000:0000:0000:0000:0010", "2001:db8::10"),
+        (" 10.96.255.10 ", "10.96.255.10"),
+        ("10.96", "10.96"),
+    ],
+)
+def test_normalise_address(value, expected):
+    assert normalise_address(value) == expected
@@ -0,0 +1,129 @@
+from bp_fabric_search.helpers.correlate import EndpointIndex, format_vrf
+
+VRF_DN = "uni/tn-common/ctx-SITE-2-TRANSIT"
+
+
+def build_endpoint(mac: str, ips: list, vrf_dn: str = VRF_DN) -> dict:
+    return {
+        "fvCEp": {
+            "attributes": {"mac": mac, "vrfDn": vrf_dn},
+            "children": [{"fvIp": {"attributes": {"addr": ip}}} for ip in ips],
+        }
+    }
+
+
+def rows_by_type(index: EndpointIndex, scope: str = "all") -> dict:
+    rows = {}
+    for row in index.iter_rows(scope=scope):
+        rows.setdefault(row[0], []).append(row)
+    return rows
+
+
+def test_format_vrf():
+    assert format_vrf(VRF_DN) == "common:SITE-2-TRANSIT"
+    assert format_vrf("ctx-unknown") == "ctx-unknown"
+
+
+def test_multi_fabric_mac():
+    index = EndpointIndex()
+    index.add(host="F1", imdata=[build_endpoint("00:50:56:85:EF:89", [])])
+    index.add(host="F2", imdata=[build_endpoint("0050.5685.ef89", [])])
+    index.add(host="F3", imdata=[build_endpoint("00:50:56:85:EF:90", [])])
+
+    rows = rows_by_type(index)
+    assert rows == {
+        "Multi-fabric MAC": [
+            ("Multi-fabric MAC", "00:50:56:85:EF:89", "", "F1\nF2", ""),
+        ]
+    }
+
+
+def test_same_fabric_repeats_are_not_reported():
+    index = EndpointIndex()
+    entry = build_endpoint("00:50:56:85:EF:89", ["10.0.0.1"])
+    index.add(host="F1", imdata=[entry])
+    index.add(host="F1", imdata=[entry])
+    assert list(index.iter_rows()) == []
+
+
+def test_multi_fabric_ip():
+    index = EndpointIndex()
+    index.add(host="F1", imdata=[build_endpoint("00:50:56:85:EF:89", ["10.0.0.1"])])
+    index.add(host="F2", imdata=[build_endpoint("00:50:56:85:EF:89", ["10.0.0.1"])])
+
+    rows = rows_by_type(index, scope="ip")
+    assert rows == {
+        "Multi-fabric IP": [
+            (
+                "Multi-fabric IP",
+                "10.0.0.1",
+                "common:SITE-2-TRANSIT",
+                "F1\nF2",
+                "00:50:56:85:EF:89",
+            )
+        ]
+    }
+
+
+def test_duplicate_ip_is_promoted_to_a_conflict():
+    index = EndpointIndex()
+    index.add(host="F1", imdata=[build_endpoint("00:50:56:85:EF:89", ["10.0.0.1"])])
+    index.add(host="F2", imdata=[build_endpoint("00:50:56:85:EF:90", ["10.0.0.1"])])
+    # a third MAC is added to the existing conflict
+    index.add(host="F2", imdata=[build_endpoint("00:50:56:85:EF:91", ["10.0.0.1"])])
+
+    assert index.ips == {}
+    rows = rows_by_type(index, scope="ip")
+    assert rows == {
+        "Duplicate IP": [
+            (
+                "Duplicate IP",
+                "10.0.0.1",
+                "common:SITE-2-TRANSIT",
+                "F1\nF2",
+                "00:50:56:85:EF:89\n00:50:56:85:EF:90\n00:50:56:85:EF:91",
+            )
+        ]
+    }
+
+
+def test_ips_are_keyed_per_vrf():
+    index = EndpointIndex()
+    index.add(host="F1", imdata=[build_endpoint("00:50:56:85:EF:89", ["10.0.0.1"])])
+    index.add(
+        host="F2",
+        imdata=[
+            build_endpoint(
+                "00:50:56:85:EF:90", ["10.0.0.1"], vrf_dn="uni/tn-common/ctx-OTHER"
+            )
+        ],
+    )
+    assert rows_by_type(index, scope="ip") == {}
+
+
+def test_ipv6_is_normalised():
+    index = EndpointIndex()
+    index.add(host="F1", imdata=[build_endpoint("00:50:56:85:EF:89", ["2001:db8::1"])])
+    index.add(
+        host="F2",
+        imdata=[build_endpoint("00:50:56:85:EF:89", ["2001:0DB8:0:0::1"])],
+    )
+    (row,) = index.iter_rows(scope="ip")
+    assert row[:2] == ("Multi-fabric IP", "2001:db8::1")
+
+
+def test_invalid_values_are_skipped():
+    index = EndpointIndex()
+    index.add(host="F1", imdata=[build_endpoint("not-a-mac", ["10.0.0.1"])])
+    index.add(host="F1", imdata=[build_endpoint("00:50:56:85:EF:89", ["bad"])])
+    assert list(index.macs) == [0x00505685EF89]
+    assert index.ips == {}
+
+
+def test_scope_filters_rows():
+    index = EndpointIndex()
+    index.add(host="F1", imdata=[build_endpoint("00:50:56:85:EF:89", ["10.0.0.1"])])
+    index.add(host="F2", imdata=[build_endpoint("00:50:56:85:EF:89", ["10.0.0.1"])])
+    assert list(rows_by_type(index, scope="mac")) == ["Multi-fabric MAC"]
+    assert list(rows_by_type(index, scope="ip")) == ["Multi-fabric IP"]
+    assert len(list(index.iter_rows(scope="all"))) == 2
@@ -0,0 +1,137 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from bp_fabric_search.history.store import HistoryStore
+
+MAC = "00:50:56:85:EF:89"
+
+
+def build_endpoint(mac: str, path: str, mod_ts: str, ips: list) -> dict:
+    children = [
+        {
+            "fvIp": {
+                "attributes": {
+                    "addr": ip,
+                    "encap": "unknown",
+                    "fabricPathDn": path,
+                    "modTs": ip_mod_ts,
+                }
+            }
+        }
+        for ip, ip_mod_ts in ips
+    ]
+    return {
+        "fvCEp": {
+            "attributes": {
+                "mac": mac,
+                "encap": "vlan-10",
+                "fabricPathDn": path,
+                "modTs": mod_ts,
+            },
+            "children": children,
+        }
+    }
+
+
+@pytest.fixture
+def store():
+    store = HistoryStore(path=":memory:")
+    yield store
+    store.close()
+
+
+def test_append_skips_known_locations(store):
+    entry = build_endpoint(
+        mac=MAC,
+        path="topology/pod-1/paths-101/pathep-[eth1/1]",
+        mod_ts="2024-09-01T00:00:00+00:00",
+        ips=[("10.0.0.1", "2024-09-01T00:00:00+00:00")],
+    )
+    assert store.append(fabric="F1", imdata=[entry]) == 1
+    assert store.append(fabric="F1", imdata=[entry]) == 0
+
+
+def test_append_mac_only_endpoint(store):
+    entry = build_endpoint(
+        mac=MAC,
+        path="topology/pod-1/paths-101/pathep-[eth1/1]",
+        mod_ts="2024-09-01T00:00:00+00:00",
+        ips=[],
+    )
+    store.append(fabric="F1", imdata=[entry])
+    (record,) = store.query_mac(
+        mac=MAC, since=datetime(2024, 1, 1, tzinfo=timezone.utc)
+    )
+    assert record["ip"] == ""
+    assert record["node"] == "101"
+    assert record["interface"] == "eth1/1"
+    assert record["encap"] == "10"
+
+
+def test_query_mac_window(store):
+    for day in [1, 5, 10]:
+        store.append(
+            fabric="F1",
+            imdata=[
+                build_endpoint(
+                    mac=MAC,
+                    path=f"topology/pod-1/paths-10{day}/pathep-[eth1/1]",
+                    mod_ts=f"2024-09-{day:02}T00:00:00+00:00",
+                    ips=[("10.0.0.1", f"2024-09-{day:02}T00:00:00+00:00")],
+                )
+            ],
+        )
+
+    records = store.query_mac(
+        mac="0050.5685.ef89", since=datetime(2024, 9, 3, tzinfo=timezone.utc)
+    )
+    # the 09-01 record is the location in effect when the window opened
+    assert [record["node"] for record in records] == ["101", "105", "1010"]
+    assert {record["mac"] for record in records} == {MAC}
+
+
+def test_query_mac_latest_location_per_fabric_and_ip(store):
+    store.append(
+        fabric="F1",
+        imdata=[
+            build_endpoint(
+                mac=MAC,
+                path="topology/pod-1/paths-101/pathep-[eth1/1]",
+                mod_ts="2024-09-02T00:00:00+00:00",
+                ips=[
+                    ("10.0.0.1", "2024-09-01T00:00:00+00:00"),
+                    ("10.0.0.2", "2024-09-02T00:00:00+00:00"),
+                ],
+            )
+        ],
+    )
+    store.append(
+        fabric="F2",
+        imdata=[
+            build_endpoint(
+                mac=MAC,
+                path="topology/pod-1/paths-201/pathep-[eth1/2]",
+                mod_ts="2024-08-01T00:00:00+00:00",
+                ips=[("10.0.0.1", "2024-08-01T00:00:00+00:00")],
+            )
+        ],
+    )
+
+    records = store.query_mac(mac=MAC, since=datetime(2024, 10, 1, tzinfo=timezone.utc))
+    assert [(record["host"], record["ip"]) for record in records] == [
+        ("F2", "10.0.0.1"),
+        ("F1", "10.0.0.1"),
+        ("F1", "10.0.0.2"),
+    ]
+
+
+def test_query_mac_unknown_mac(store):
+    assert (
+        store.query_mac(mac=MAC, since=datetime(2024, 1, 1, tzinfo=timezone.utc)) == []
+    )
+
+
+def test_query_mac_invalid_mac(store):
+    with pytest.raises(ValueError):
+        store.query_mac(mac="zz", since=datetime(2024, 1, 1, tzinfo=timezone.utc))
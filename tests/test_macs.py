@@ -0,0 +1,21 @@
+import pytest
+
+from bp_fabric_search.helpers.macs import int_to_mac, mac_to_int
+
+
+@pytest.mark.parametrize(
+    "mac", ["00:50:56:85:EF:89", "00-50-56-85-ef-89", "0050.5685.ef89", "00505685EF89"]
+)
+def test_mac_to_int_notations(mac):
+    assert mac_to_int(mac) == 0x00505685EF89
+
+
+@pytest.mark.parametrize("mac", ["zz", "00:50:56:85:EF", "00:50:56:85:EF:ZZ"])
+def test_mac_to_int_invalid(mac):
+    with pytest.raises(ValueError):
+        mac_to_int(mac)
+
+
+def test_int_to_mac_round_trip():
+    assert int_to_mac(mac_to_int("0050.5685.ef89")) == "00:50:56:85:EF:89"
+    assert int_to_mac(0) == "00:00:00:00:00:00"
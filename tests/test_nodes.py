@@ -0,0 +1,96 @@
+import asyncio
+from argparse import Namespace
+
+import pytest
+from httpx import AsyncClient
+
+from bp_fabric_search.helpers import nodes
+from bp_fabric_search.helpers.config import SETTINGS
+from bp_fabric_search.inventory import InventoryItem
+
+NODE_DNS = ["topology/pod-1/node-101", "topology/pod-1/node-102"]
+
+
+def route_args(**kwargs) -> Namespace:
+    args = dict(
+        prefix="10.96.0.0/24", vrf=None, exact=False, node=None, concurrency=None
+    )
+    args.update(kwargs)
+    return Namespace(**args)
+
+
+def route_entry(node: str) -> dict:
+    return {
+        "uribv4Route": {
+            "attributes": {
+                "dn": f"{node}/sys/uribv4/dom-overlay-1/db-rt/rt-[10.96.0.0/24]",
+                "prefix": "10.96.0.0/24",
+            },
+            "children": [],
+        }
+    }
+
+
+@pytest.fixture
+def item(tmp_path, monkeypatch):
+    monkeypatch.setitem(SETTINGS, "NODE_CACHE_PATH", str(tmp_path / "nodes.json"))
+    return InventoryItem(
+        name="FABRIC-1", host="https://apic.example.com", client=AsyncClient()
+    )
+
+
+def test_build_node_route_queries_paged():
+    queries = nodes.build_node_route_queries(
+        args=route_args(vrf="common:default"), nodes=NODE_DNS, page_size=5
+    )
+    assert len(queries) == 2
+    assert queries[0].startswith("/node/mo/topology/pod-1/node-101/sys/uribv4/dom-")
+    assert all(query.endswith("&page=0&page-size=5") for query in queries)
+
+
+def test_get_nodes_without_cache_fails(item, monkeypatch):
+    async def query_clients_paged(item, query, page_size):
+        yield dict(host=item.name, resp=None)
+
+    monkeypatch.setattr(nodes, "query_clients_paged", query_clients_paged)
+    assert asyncio.run(nodes.get_nodes(item=item)) is None
+
+
+def test_get_nodes_falls_back_to_cache(item, monkeypatch):
+    nodes.save_node_cache({item.name: dict(timestamp=0, nodes=NODE_DNS)})
+
+    async def query_clients_paged(item, query, page_size):
+        yield dict(host=item.name, resp=None)
+
+    monkeypatch.setattr(nodes, "query_clients_paged", query_clients_paged)
+    assert asyncio.run(nodes.get_nodes(item=item)) == NODE_DNS
+
+
+def test_query_route_nodes_without_nodes_skips_host(item, monkeypatch):
+    async def get_nodes(item, refresh=False):
+        return None
+
+    monkeypatch.setattr(nodes, "get_nodes", get_nodes)
+    host_resp = asyncio.run(nodes.query_route_nodes(item=item, args=route_args()))
+    assert host_resp == dict(host=item.name, resp=None)
+
+
+@pytest.mark.parametrize("failed_nodes, expected", [(set(), 2), ({"node-102"}, None)])
+def test_query_route_nodes_merges_or_skips(item, monkeypatch, failed_nodes, expected):
+    async def get_nodes(item, refresh=False):
+        return NODE_DNS
+
+    async def query_clients(item, query):
+        node = query.split("/")[5]
+        if node in failed_nodes:
+            return dict(host=item.name, resp=None)
+        imdata = [route_entry(f"topology/pod-1/{node}")]
+        return dict(host=item.name, resp=dict(totalCount="1", imdata=imdata))
+
+    monkeypatch.setattr(nodes, "get_nodes", get_nodes)
+    monkeypatch.setattr(nodes, "query_clients", query_clients)
+    host_resp = asyncio.run(nodes.query_route_nodes(item=item, args=route_args()))
+    if expected is None:
+        assert host_resp["resp"] is None
+    else:
+        assert len(host_resp["resp"]["imdata"]) == expected
@@ -0,0 +1,103 @@
+import io
+
+import pytest
+
+from bp_fabric_search.helpers.printer import (ADDRESS_COLUMN_WIDTH,
+                                              MIN_COLUMN_WIDTH, format_cell,
+                                              render_table, select_rows)
+
+FIELD_NAMES = ["Host", "IP", "Node"]
+
+ROWS = [
+    ("FABRIC-2", "10.0.0.10", "102"),
+    ("FABRIC-1", "10.0.0.9", "1001"),
+    ("FABRIC-1", "", "101"),
+    ("FABRIC-3", "2001:db8::1\n10.0.0.1", "99"),
+]
+
+
+def render(field_names: list, rows: list, **kwargs) -> list:
+    stream = io.StringIO()
+    render_table(field_names=field_names, rows=rows, stream=stream, **kwargs)
+    return stream.getvalue().splitlines()
+
+
+def test_select_rows_limit():
+    field_names, rows = select_rows(field_names=FIELD_NAMES, rows=iter(ROWS), limit=2)
+    assert field_names == FIELD_NAMES
+    assert list(rows) == ROWS[:2]
+
+
+def test_select_rows_sort_numeric():
+    _, rows = select_rows(field_names=FIELD_NAMES, rows=ROWS, sort="node")
+    assert [row[2] for row in rows] == ["99", "101", "102", "1001"]
+
+
+def test_select_rows_sort_numeric_limit_reverse():
+    _, rows = select_rows(
+        field_names=FIELD_NAMES, rows=ROWS, sort="Node", reverse=True, limit=2
+    )
+    assert [row[2] for row in rows] == ["1001", "102"]
+
+
+def test_select_rows_sort_address_invalid_last():
+    _, rows = select_rows(field_names=FIELD_NAMES, rows=ROWS, sort="ip")
+    assert [row[1] for row in rows] == [
+        "10.0.0.9",
+        "10.0.0.10",
+        "2001:db8::1\n10.0.0.1",
+        "",
+    ]
+
+
+def test_select_rows_columns():
+    field_names, rows = select_rows(
+        field_names=FIELD_NAMES, rows=ROWS, columns="node, host", limit=1
+    )
+    assert field_names == ["Node", "Host"]
+    assert list(rows) == [("102", "FABRIC-2")]
+
+
+def test_select_rows_unknown_column():
+    with pytest.raises(ValueError):
+        select_rows(field_names=FIELD_NAMES, rows=ROWS, sort="vlan")
+
+
+def test_format_cell_truncates_to_width():
+    assert format_cell("abcdefgh", MIN_COLUMN_WIDTH) == "a..."
+    assert format_cell("abcdefgh", 6, truncate=False) == "abcdefgh"
+    assert format_cell("ab", 4) == " ab "
+
+
+def test_render_table_rows_match_border():
+    lines = render(FIELD_NAMES, ROWS)
+    assert len({len(line) for line in lines}) == 1
+    assert lines[0] == lines[2] == lines[-1]
+    assert len(lines) == 3 + 5 + 1
+
+
+def test_render_table_truncates_after_sample():
+    rows = [("h", "", "1")] * 2 + [("h", "", "topology/pod-1/node-101")]
+    lines = render(FIELD_NAMES, rows, sample_size=2)
+    assert len({len(line) for line in lines}) == 1
+    assert "t..." in lines[-2]
+
+
+def test_render_table_never_truncates_addresses():
+    # a MAC only sample leaves the IP column as narrow as its header
+    rows = [("h", "", "1")] * 2 + [("h", "10.100.200.250/32", "1")]
+    lines = render(FIELD_NAMES, rows, sample_size=2)
+    assert len({len(line) for line in lines}) == 1
+    assert "10.100.200.250/32" in lines[-2]
+    assert len(lines[0].split("+")[2]) == ADDRESS_COLUMN_WIDTH + 2
+
+    rows = [("h", "", "1")] * 2 + [("h", "2001:db8:1234:5678::1/128", "1")]
+    lines = render(FIELD_NAMES, rows, sample_size=2)
+    assert "2001:db8:1234:5678::1/128" in lines[-2]
+
+
+def test_render_table_max_width():
+    rows = [("x" * 100, "10.0.0.1", "1")]
+    lines = render(FIELD_NAMES, rows, max_width=10)
+    assert len(lines[0].split("+")[1]) == 12
+    assert "xxxxxxx..." in lines[3]
@@ -0,0 +1,164 @@
+import copy
+from argparse import Namespace
+
+from bp_fabric_search.helpers.watch import (build_snapshot, diff_snapshots,
+                                            update_snapshots)
+
+ENDPOINT_QUERY = Namespace(subparser_name="mac")
+ROUTE_QUERY = Namespace(subparser_name="route")
+
+ENDPOINT_DN = "uni/tn-CUST/ap-APP/epg-WEB/cep-00:50:56:85:6F:F9"
+ROUTE_DN = "topology/pod-1/node-101/sys/uribv4/dom-CUST:VRF/db-rt/rt-[10.96.0.0/24]"
+
+
+def ip_child(addr: str, node: str = "101", interface: str = "eth1/10") -> dict:
+    return {
+        "fvIp": {
+            "attributes": {
+                "addr": addr,
+                "rn": f"ip-[{addr}]",
+                "encap": "vlan-1411",
+                "fabricPathDn": f"topology/pod-1/paths-{node}/pathep-[{interface}]",
+            }
+        }
+    }
+
+
+def nexthop_child(addr: str, metric: str = "20") -> dict:
+    return {
+        "uribv4Nexthop": {
+            "attributes": {
+                "addr": addr,
+                "rn": f"nh-[eth1/49]-addr-[{addr}]-vrf-[overlay-1]",
+                "if": "eth1/49",
+                "metric": metric,
+                "pref": "110",
+                "routeType": "ospf",
+                "vrf": "overlay-1",
+            }
+        }
+    }
+
+
+def endpoint(children: list) -> dict:
+    return {
+        "fvCEp": {
+            "attributes": {
+                "dn": ENDPOINT_DN,
+                "mac": "00:50:56:85:6F:F9",
+                "lcC": "learned",
+                "encap": "vlan-1411",
+                "fabricPathDn": "topology/pod-1/paths-101/pathep-[eth1/10]",
+            },
+            "children": children,
+        }
+    }
+
+
+def route(children: list) -> dict:
+    return {
+        "uribv4Route": {
+            "attributes": {"dn": ROUTE_DN, "prefix": "10.96.0.0/24"},
+            "children": children,
+        }
+    }
+
+
+def host_resp(imdata: list, host: str = "FABRIC-1") -> dict:
+    return dict(host=host, resp=dict(totalCount=str(len(imdata)), imdata=imdata))
+
+
+def snapshot(imdata: list, query: Namespace) -> dict:
+    return build_snapshot(host_resp=host_resp(imdata), query=query)
+
+
+def test_build_snapshot_keys_children_on_dn():
+    current = snapshot(
+        [endpoint([ip_child("10.0.0.1"), ip_child("10.0.0.2", node="102")])],
+        ENDPOINT_QUERY,
+    )
+    entry = current[ENDPOINT_DN]
+    assert entry["fields"]["IP"] == "10.0.0.1\n10.0.0.2"
+    assert entry["children"]["ip-[10.0.0.2]"] == {
+        "IP": "10.0.0.2",
+        "Encap": "1411",
+        "Node": "102",
+        "Interface": "eth1/10",
+    }
+
+
+def test_reordered_children_are_not_changes():
+    children = [ip_child("10.0.0.1"), ip_child("10.0.0.2", node="102")]
+    previous = snapshot([endpoint(children)], ENDPOINT_QUERY)
+    current = snapshot([endpoint(list(reversed(children)))], ENDPOINT_QUERY)
+    assert diff_snapshots(host="FABRIC-1", previous=previous, current=current) == []
+
+    nexthops = [nexthop_child("10.1.1.1"), nexthop_child("10.1.1.2")]
+    previous = snapshot([route(nexthops)], ROUTE_QUERY)
+    current = snapshot([route(list(reversed(nexthops)))], ROUTE_QUERY)
+    assert diff_snapshots(host="FABRIC-1", previous=previous, current=current) == []
+
+
+def test_child_move_add_and_remove():
+    previous = snapshot(
+        [endpoint([ip_child("10.0.0.1"), ip_child("10.0.0.2")])], ENDPOINT_QUERY
+    )
+    current = snapshot(
+        [endpoint([ip_child("10.0.0.1", node="102"), ip_child("10.0.0.3")])],
+        ENDPOINT_QUERY,
+    )
+    assert diff_snapshots(host="FABRIC-1", previous=previous, current=current) == [
+        f"~ FABRIC-1 {ENDPOINT_DN} ip=10.0.0.1 node 101 -> 102, "
+        "removed ip=10.0.0.2 encap=1411 node=101 interface=eth1/10, "
+        "added ip=10.0.0.3 encap=1411 node=101 interface=eth1/10"
+    ]
+
+
+def test_nexthop_change():
+    previous = snapshot([route([nexthop_child("10.1.1.1")])], ROUTE_QUERY)
+    current = snapshot([route([nexthop_child("10.1.1.1", metric="30")])], ROUTE_QUERY)
+    assert diff_snapshots(host="FABRIC-1", previous=previous, current=current) == [
+        f"~ FABRIC-1 {ROUTE_DN} next hop=10.1.1.1 metric 20 -> 30"
+    ]
+
+
+def test_mac_only_endpoint_move():
+    previous = snapshot([endpoint([])], ENDPOINT_QUERY)
+    moved = endpoint([])
+    moved["fvCEp"]["attributes"][
+        "fabricPathDn"
+    ] = "topology/pod-1/paths-102/pathep-[eth1/12]"
+    current = snapshot([moved], ENDPOINT_QUERY)
+    assert diff_snapshots(host="FABRIC-1", previous=previous, current=current) == [
+        f"~ FABRIC-1 {ENDPOINT_DN} node 101 -> 102, interface eth1/10 -> eth1/12"
+    ]
+
+
+def test_added_and_removed_entries():
+    entry = endpoint([])
+    other = copy.deepcopy(entry)
+    other["fvCEp"]["attributes"]["dn"] = ENDPOINT_DN.replace("epg-WEB", "epg-APP")
+    changes = diff_snapshots(
+        host="FABRIC-1",
+        previous=snapshot([entry], ENDPOINT_QUERY),
+        current=snapshot([other], ENDPOINT_QUERY),
+    )
+    assert [change[0] for change in changes] == ["+", "-"]
+    assert "epg=APP" in changes[0]
+
+
+def test_update_snapshots_keeps_failed_hosts():
+    snapshots = {}
+    first = [host_resp([endpoint([ip_child("10.0.0.1")])])]
+    assert update_snapshots(snapshots, first, ENDPOINT_QUERY) == []
+    baseline = snapshots["FABRIC-1"]
+
+    # a failed poll is neither a removal nor replaces the last known state
+    failed = [dict(host="FABRIC-1", resp=None)]
+    assert update_snapshots(snapshots, failed, ENDPOINT_QUERY) == []
+    assert snapshots["FABRIC-1"] is baseline
+
+    moved = [host_resp([endpoint([ip_child("10.0.0.1", node="102")])])]
+    assert update_snapshots(snapshots, moved, ENDPOINT_QUERY) == [
+        f"~ FABRIC-1 {ENDPOINT_DN} ip=10.0.0.1 node 101 -> 102"
+    ]